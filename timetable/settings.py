@@ -140,3 +140,60 @@ CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
 
 FRONTEND_URL = 'http://31.220.82.177:3000'
+
+# Worker processes used to solve independent timetable partitions; 1 keeps
+# generation in the request process
+TIMETABLE_GENERATION_WORKERS = int(os.environ.get('TIMETABLE_GENERATION_WORKERS', 1))
+
+# Randomized greedy runs per generation; the best scoring one is kept
+TIMETABLE_GENERATION_STARTS = int(os.environ.get('TIMETABLE_GENERATION_STARTS', 1))
+
+# Wall-clock seconds the local search spends improving each schedule
+TIMETABLE_OPTIMIZATION_SECONDS = float(os.environ.get('TIMETABLE_OPTIMIZATION_SECONDS', 10))
+
+# Background timetable generation: 'celery' queues jobs on the broker,
+# 'thread' runs them in a thread of the web process
+TIMETABLE_JOB_BACKEND = os.environ.get('TIMETABLE_JOB_BACKEND', 'celery')
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+# Run tasks inline, useful for local testing without a worker
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', '') == '1'
+
+# Record each generation phase's Python heap peak in the job profile;
+# tracing makes the solver several times slower, so keep it for diagnosis
+TIMETABLE_TRACE_MEMORY = os.environ.get('TIMETABLE_TRACE_MEMORY', '') == '1'
+
+# Inactive timetable versions kept for comparison after each generation
+TIMETABLE_VERSIONS_KEPT = int(os.environ.get('TIMETABLE_VERSIONS_KEPT', 5))
+
+# Generation results are cached by a fingerprint of their inputs and must
+# be shared by the web and worker processes. With REDIS_CACHE_URL set the
+# cache lives in Redis (configure the server with an allkeys-lru maxmemory
+# policy); otherwise in a database table made by `manage.py createcachetable`
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'timetable_cache',
+        }
+    }
+
+# Off by default: the database cache needs its table from createcachetable
+TIMETABLE_RESULT_CACHE = os.environ.get('TIMETABLE_RESULT_CACHE', '0') == '1'
+TIMETABLE_RESULT_CACHE_TTL = int(os.environ.get('TIMETABLE_RESULT_CACHE_TTL', 24 * 60 * 60))
+# Most results kept at once and largest single result stored
+TIMETABLE_RESULT_CACHE_ENTRIES = int(os.environ.get('TIMETABLE_RESULT_CACHE_ENTRIES', 20))
+TIMETABLE_RESULT_CACHE_MAX_BYTES = int(os.environ.get('TIMETABLE_RESULT_CACHE_MAX_BYTES', 5 * 1024 * 1024))
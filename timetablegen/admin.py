@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Department, Module, Program, Room, Staff, Timetable, TeacherPreference
+from .models import Department, Module, Program, Room, Staff, Timetable, TeacherPreference, GenerationJob
 
 admin.site.register(Department)
 admin.site.register(Module)
@@ -7,4 +7,5 @@ admin.site.register(Program)
 admin.site.register(Room)
 admin.site.register(Staff)
 admin.site.register(Timetable)
-admin.site.register(TeacherPreference)
\ No newline at end of file
+admin.site.register(TeacherPreference)
+admin.site.register(GenerationJob)
\ No newline at end of file
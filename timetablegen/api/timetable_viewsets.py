@@ -1,8 +1,10 @@
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from ..models import Timetable, TeacherPreference, ClassModuleAllocation, Class, Conflict
+from ..jobs import start_generation_job
+from ..models import Timetable, TimetableVersion, TeacherPreference, ClassModuleAllocation, Class, Conflict
 from ..serializers import (
+    GenerationJobSerializer,
     TimetableSerializer, 
     TeacherPreferenceSerializer,
     ClassModuleAllocationSerializer,
@@ -11,21 +13,35 @@ from ..serializers import (
 )
 
 class TimetableViewSet(viewsets.ModelViewSet):
-    queryset = Timetable.objects.select_related(
+    queryset = Timetable.objects.active().select_related(
         'module_id',
         'room_id',
         'staff_id',
         'class_id'
-    ).all()
+    )
     serializer_class = TimetableSerializer
 
+    def perform_create(self, serializer):
+        serializer.save(version=self._active_version())
+
+    def perform_update(self, serializer):
+        serializer.save(version=self._active_version())
+
+    def _active_version(self):
+        """Entries written through the API belong to the published version"""
+        version = TimetableVersion.active()
+        if version is None:
+            raise serializers.ValidationError({'version': 'No timetable version has been published yet'})
+        return version
+
     @action(detail=False, methods=['post'])
     def generate(self, request):
         try:
-            # Add your timetable generation logic here
-            return Response({
-                'message': 'Timetable generated successfully'
-            }, status=status.HTTP_201_CREATED)
+            job = start_generation_job(user=request.user)
+            return Response(
+                GenerationJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED
+            )
         except Exception as e:
             return Response({
                 'error': str(e)
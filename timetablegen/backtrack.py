@@ -1,44 +1,599 @@
-from .models import Module, Room, Staff, Timetable, TeacherPreference, ClassModuleAllocation, Program
-from django.db.models import Q
+from .models import Timetable, TimetableVersion
+from .instance import ProblemInstance
+from .parallel import init_portfolio_worker, solve_backtrack
+from .slotgrid import to_minutes
+from .solution import SolutionStore, minute_time
+from django.db import connections, transaction
 from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing
 import random
+import time
+from collections import defaultdict
+
+# Conflict sets larger than this are not worth storing as nogoods; they
+# rarely recur and cost the most to match
+MAX_NOGOOD_SIZE = 12
+
+
+def luby(index):
+    """Term ``index`` (from 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ..."""
+    while True:
+        size = 1
+        while size - 1 < index:
+            size <<= 1
+        # index lies in a block of size - 1 terms ending in size / 2
+        if index == size - 1:
+            return size >> 1
+        index -= (size >> 1) - 1
 
 class BacktrackTimetableGenerator:
-    def __init__(self, academic_year, semester):
+    def __init__(
+        self, academic_year, semester, instance=None, forward_checking=True, seed=None,
+        node_limit=None, time_limit=None, restart_nodes=None, max_restarts=0,
+        backjumping=True, nogood_limit=500, luby_restarts=False, stop_event=None
+    ):
         self.academic_year = academic_year
         self.semester = semester
         self.timetable = []
         self.time_slots = self._generate_time_slots()
+        self.slot_positions = {slot['start_time']: index for index, slot in enumerate(self.time_slots)}
+
+        # Occupancy of the partial timetable, kept in step with self.timetable:
+        # (day, start) -> busy staff and room indices, and
+        # (day, end, room index) -> the entry ending there
+        self.staff_busy = defaultdict(set)
+        self.room_busy = defaultdict(set)
+        self.room_ends = {}
         self.days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        self.allocations = list(ClassModuleAllocation.objects.filter(academic_year=self.academic_year, semester=self.semester))
+        # All rows the search reads, loaded once up front
+        self.instance = instance or ProblemInstance.load(academic_year, semester)
+        self.allocations = self.instance.allocations
+
+        # Propagate each assignment into the remaining domains and pick
+        # variables by MRV and values by LCV instead of list order
+        self.forward_checking = forward_checking
+        self.rng = random.Random(seed)
+
+        # With forward checking, jump back to the deepest assignment that
+        # caused a failure and remember up to ``nogood_limit`` failing
+        # combinations of assignments, oldest forgotten first
+        self.backjumping = backjumping and forward_checking
+        self.nogood_limit = nogood_limit
+
+        # Search limits: total nodes, wall-clock seconds, and restarts after
+        # every ``restart_nodes`` nodes, at most ``max_restarts`` times (None
+        # for no limit); with ``luby_restarts`` the i-th attempt gets
+        # ``restart_nodes * luby(i)`` nodes instead
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.restart_nodes = restart_nodes
+        self.max_restarts = max_restarts
+        self.luby_restarts = luby_restarts
+        # Shared event another process sets to stop this search
+        self.stop_event = stop_event
+        self.seed = seed
+
+        # Progress, updated as the search runs
+        self.status = 'pending'
+        self.nodes = 0
+        self.depth = 0
+        self.best_depth = 0
+        self.restarts = 0
+        self.backjumps = 0
+        self.cancelled = False
+
+        # Teacher preferences by staff index and day as sorted
+        # (start, end, weight) intervals, and per-teacher slot weights and
+        # preference-ordered slots derived from them on first use
+        self.preference_index = [defaultdict(list) for _ in self.instance.staff]
+        for staff_index, preferences in enumerate(self.instance.preferences):
+            for day, start, end, weight in preferences:
+                self.preference_index[staff_index][day].append((start, end, weight))
+        self.slot_weights = {}
+        self.available_slots = {}
+        # (module type, class capacity) -> suitable rooms in a seeded order
+        self.suitable_rooms = {}
+
+        # Every (day, hour) slot of the week; a slot index is its position
+        self.week_slots = [
+            dict(slot, day=day, index=day_index * len(self.time_slots) + slot_index)
+            for day_index, day in enumerate(self.days)
+            for slot_index, slot in enumerate(self.time_slots)
+        ]
 
-    def generate(self):
-        if self._backtrack(0):
+    def generate(self, workers=1):
+        """Search for a timetable, racing ``workers`` seeded searches if above one"""
+        if workers > 1:
+            solved = self._run_portfolio(workers)
+        else:
+            solved = self._run()
+        if solved:
             return self.timetable
         return None
 
-    def _backtrack(self, allocation_index):
-        if allocation_index == len(self.allocations):
-            return True
+    def progress(self):
+        """Search counters; safe to read from another thread while running"""
+        return {
+            'status': self.status,
+            'nodes': self.nodes,
+            'depth': self.depth,
+            'best_depth': self.best_depth,
+            'total': len(self.allocations),
+            'restarts': self.restarts,
+            'backjumps': self.backjumps,
+        }
+
+    def cancel(self):
+        """Ask a running search to stop at its next node"""
+        self.cancelled = True
+
+    def _run(self):
+        """Search attempts until one finishes or a limit is hit"""
+        self.status = 'running'
+        self._started = time.monotonic()
+        self._init_domains()
+        while True:
+            cutoff = None
+            if self.restart_nodes and (
+                self.max_restarts is None or self.restarts < self.max_restarts
+            ):
+                attempt_nodes = self.restart_nodes
+                if self.luby_restarts:
+                    attempt_nodes *= luby(self.restarts + 1)
+                cutoff = self.nodes + attempt_nodes
+            outcome = self._search(cutoff)
+            if outcome == 'restart':
+                self.restarts += 1
+                # Draw fresh room orders for the next attempt
+                self.suitable_rooms.clear()
+                continue
+            self.status = outcome
+            return outcome == 'solved'
+
+    def _run_portfolio(self, workers):
+        """Race differently seeded searches in worker processes.
+
+        The first search to finish with a timetable or a proof of
+        infeasibility decides the outcome; the others see the shared stop
+        event at their next limit check and give up.
+        """
+        self.status = 'running'
+        base_seed = self.seed if self.seed is not None else 0
+        options = {
+            'forward_checking': self.forward_checking,
+            'node_limit': self.node_limit,
+            'time_limit': self.time_limit,
+            'restart_nodes': self.restart_nodes,
+            'max_restarts': self.max_restarts,
+            'backjumping': self.backjumping,
+            'nogood_limit': self.nogood_limit,
+            'luby_restarts': self.luby_restarts,
+        }
+
+        stop_event = multiprocessing.Event()
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        outcome = None
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_portfolio_worker,
+            initargs=(stop_event,)
+        ) as pool:
+            pending = {
+                pool.submit(
+                    solve_backtrack, self.instance, self.academic_year, self.semester,
+                    base_seed + index, options
+                )
+                for index in range(workers)
+            }
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        placements, progress = future.result()
+                        if outcome is None or progress['status'] in ('solved', 'infeasible'):
+                            outcome = (placements, progress)
+                    if outcome[1]['status'] in ('solved', 'infeasible'):
+                        break
+            finally:
+                # Also on a failed worker, so the pool does not wait out the
+                # remaining searches before the error surfaces
+                stop_event.set()
+                for future in pending:
+                    future.cancel()
+
+        placements, progress = outcome
+        self.status = progress['status']
+        self.nodes = progress['nodes']
+        self.best_depth = progress['best_depth']
+        self.restarts = progress['restarts']
+        self.backjumps = progress['backjumps']
+        if placements is None:
+            return False
+        self._import_placements(placements)
+        return True
+
+    def export_placements(self):
+        """The timetable in compact columns that can cross process boundaries"""
+        store = SolutionStore()
+        for entry in self.timetable:
+            store.append(
+                entry['allocation'].index,
+                self.days.index(entry['day_of_week']),
+                to_minutes(entry['start_time']),
+                to_minutes(entry['end_time']),
+                entry['room_id'].index
+            )
+        return store
 
-        allocation = self.allocations[allocation_index]
-        module = allocation.module
-        staff = allocation.staff
-        available_slots = self._get_available_slots(staff)
-        suitable_rooms = self._get_suitable_rooms(module)
+    def _import_placements(self, store):
+        for allocation_index, day_index, start, _, room_index in store:
+            slot_index = day_index * len(self.time_slots) + self.slot_positions[minute_time(start)]
+            self._add_to_timetable(
+                self.allocations[allocation_index],
+                self.instance.rooms[room_index],
+                self.week_slots[slot_index]
+            )
 
-        random.shuffle(available_slots)
-        random.shuffle(suitable_rooms)
+    def _search(self, cutoff=None):
+        """Iterative depth-first search over an explicit stack of frames.
 
-        for slot in available_slots:
-            for room in suitable_rooms:
-                if self._is_valid_assignment(module, staff, room, slot):
-                    self._add_to_timetable(module, staff, room, slot)
-                    if self._backtrack(allocation_index + 1):
-                        return True
-                    self._remove_last_entry()
+        Each frame holds a variable, its ordered values, the next value to
+        try and the trail length before its current assignment; undoing an
+        assignment pops the trail back to that mark. With backjumping, a
+        frame whose values run out returns to the deepest assignment in its
+        conflict set instead of its parent. Returns 'solved',
+        'infeasible', 'restart' when ``cutoff`` nodes are reached, or the
+        limit that stopped it.
+        """
+        variable = self._select_variable()
+        if variable is None:
+            return 'solved'
+        stack = [_Frame(variable, self._order_values(variable), len(self.trail))]
+        self.depth = 1
 
-        return False
+        while stack:
+            limit = self._limit_reached()
+            if limit or (cutoff is not None and self.nodes >= cutoff):
+                self._unwind(stack)
+                return limit or 'restart'
+
+            frame = stack[-1]
+            if frame.assigned:
+                self._unassign(frame)
+            if frame.position == len(frame.values):
+                stack.pop()
+                if self.backjumping and not self._backjump(frame, stack):
+                    self._unwind(stack)
+                    return 'infeasible'
+                self.depth = len(stack)
+                continue
+
+            slot_index, room_index = frame.values[frame.position]
+            frame.position += 1
+            self.nodes += 1
+            if not self._assign(frame, slot_index, room_index):
+                continue
+
+            variable = self._select_variable()
+            if variable is None:
+                return 'solved'
+            stack.append(_Frame(variable, self._order_values(variable), len(self.trail)))
+            self.depth = len(stack)
+            self.best_depth = max(self.best_depth, self.depth - 1)
+
+        return 'infeasible'
+
+    def _backjump(self, frame, stack):
+        """Pop to the deepest culprit of an exhausted frame; False if there is none.
+
+        The frame's conflict set gathers the assignments behind each of its
+        failed values, plus whatever pruned its domain before it was tried.
+        Together they can never be extended to a solution, so they are
+        stored as a nogood and the culprit inherits the rest of the set.
+        """
+        conflict = frame.conflict
+        conflict.update(self.pruned_by[frame.variable])
+        if not conflict:
+            return False
+        self._record_nogood(conflict, stack)
+        if stack[-1].variable not in conflict:
+            self.backjumps += 1
+        while stack[-1].variable not in conflict:
+            self._unassign(stack.pop())
+        conflict.discard(stack[-1].variable)
+        stack[-1].conflict.update(conflict)
+        return True
+
+    def _record_nogood(self, conflict, stack):
+        """Store a conflict set's assignments, watched on the two deepest.
+
+        A nogood can only be completed by its last assignment that does not
+        hold yet, so it is watched on two such (variable, slot, room)
+        literals rather than on all of them, as SAT solvers do with clauses.
+        The backjump that follows undoes the deepest one.
+        """
+        if not self.nogood_limit or len(conflict) > MAX_NOGOOD_SIZE:
+            return
+        key = tuple(sorted((variable,) + self.values[variable] for variable in conflict))
+        if key in self.nogoods:
+            return
+
+        deepest = []
+        for frame in reversed(stack):
+            if frame.variable in conflict:
+                deepest.append(frame.variable)
+                if len(deepest) == 2:
+                    break
+        literals = [(variable,) + self.values[variable] for variable in deepest]
+        literals.extend(
+            (variable,) + self.values[variable] for variable in conflict if variable not in deepest
+        )
+        self.nogoods[key] = literals
+        for literal in literals[:2]:
+            self.nogood_watch[literal].add(key)
+
+        if len(self.nogoods) > self.nogood_limit:
+            oldest = next(iter(self.nogoods))
+            for literal in self.nogoods.pop(oldest)[:2]:
+                self.nogood_watch[literal].discard(oldest)
+
+    def _nogood_conflict(self, variable, slot_index, room_index):
+        """Other assignments of a stored nogood this value would complete.
+
+        The value is about to hold, so nogoods watching it move the watch
+        to another literal that does not hold. One that has none left is
+        complete once its other watched literal holds too.
+        """
+        literal = (variable, slot_index, room_index)
+        watchers = self.nogood_watch.get(literal)
+        if not watchers:
+            return None
+        values = self.values
+        for key in list(watchers):
+            literals = self.nogoods[key]
+            if len(literals) == 1:
+                return set()
+            if literals[0] != literal:
+                literals[0], literals[1] = literals[1], literals[0]
+            for position in range(2, len(literals)):
+                other, slot, room = literals[position]
+                if values[other] != (slot, room):
+                    literals[0], literals[position] = literals[position], literal
+                    watchers.discard(key)
+                    self.nogood_watch[literals[0]].add(key)
+                    break
+            else:
+                other, slot, room = literals[1]
+                if values[other] == (slot, room):
+                    return {other for other, _, _ in literals[1:]}
+        return None
+
+    def _limit_reached(self):
+        if self.cancelled:
+            return 'cancelled'
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return 'node_limit'
+        # Reading the clock or the shared stop event every node would
+        # dominate cheap nodes
+        if not self.nodes % 256:
+            if self.stop_event is not None and self.stop_event.is_set():
+                return 'cancelled'
+            if self.time_limit is not None and time.monotonic() - self._started >= self.time_limit:
+                return 'time_limit'
+        return None
+
+    def _assign(self, frame, slot_index, room_index):
+        """Place a value; False if it is invalid or wipes out a domain"""
+        variable = frame.variable
+        allocation = self.allocations[variable]
+        room = self.instance.rooms[room_index]
+        slot = self.week_slots[slot_index]
+        if not self.forward_checking and not self._is_valid_assignment(
+            allocation, allocation.staff_id, room, slot
+        ):
+            return False
+        if self.backjumping:
+            culprits = self._nogood_conflict(variable, slot_index, room_index)
+            if culprits is not None:
+                frame.conflict.update(culprits)
+                return False
+
+        self.assigned[variable] = True
+        self.values[variable] = (slot_index, room_index)
+        self.unassigned.discard(variable)
+        frame.assigned = True
+        self._add_to_timetable(allocation, room, slot)
+        if self.forward_checking:
+            self._count_domain(variable, -1)
+            wiped_out = self._forward_check(variable, slot_index, room_index)
+            if wiped_out is None:
+                return True
+            if self.backjumping:
+                # Whatever emptied that domain, other than this assignment
+                frame.conflict.update(self.pruned_by[wiped_out])
+                frame.conflict.discard(variable)
+            return False
+        return True
+
+    def _unassign(self, frame):
+        self._undo_to(frame.mark)
+        self._remove_last_entry()
+        if self.forward_checking:
+            self._count_domain(frame.variable, 1)
+        self.assigned[frame.variable] = False
+        self.values[frame.variable] = None
+        self.unassigned.add(frame.variable)
+        frame.assigned = False
+
+    def _unwind(self, stack):
+        """Undo every assignment on the stack, deepest first"""
+        while stack:
+            frame = stack.pop()
+            if frame.assigned:
+                self._unassign(frame)
+        self.depth = 0
+
+    def _select_variable(self):
+        if not self.unassigned:
+            return None
+        if not self.forward_checking:
+            return min(self.unassigned)
+        # Fewest remaining values first, busiest teacher on ties, then the
+        # seeded rank so differently seeded searches branch differently
+        return min(self.unassigned, key=lambda index: (
+            self.domain_sizes[index], -len(self.staff_peers[index]), self.tie_rank[index]
+        ))
+
+    def _init_domains(self):
+        """Live (slot index -> room indices) domain of every allocation"""
+        slots_per_day = len(self.time_slots)
+        self.assigned = [False] * len(self.allocations)
+        self.values = [None] * len(self.allocations)
+        self.unassigned = set(range(len(self.allocations)))
+        self.trail = []
+        # Per allocation, how many of its values each assigned allocation pruned
+        self.pruned_by = [defaultdict(int) for _ in self.allocations]
+        # Stored nogoods, oldest first, as sorted (variable, slot, room) key ->
+        # literals with the two watched ones first, and the nogoods each
+        # (variable, slot, room) literal is watching for
+        self.nogoods = {}
+        self.nogood_watch = defaultdict(set)
+        self.domains = []
+        self.domain_sizes = []
+        staff_groups = defaultdict(list)
+        self.room_peers = defaultdict(list)
+
+        for index, allocation in enumerate(self.allocations):
+            rooms = [room.index for room in self._get_suitable_rooms(allocation)]
+            self.domains.append({slot['index']: set(rooms) for slot in self.week_slots} if rooms else {})
+            self.domain_sizes.append(len(rooms) * len(self.week_slots))
+            staff_groups[allocation.staff_id.index].append(index)
+            for room in rooms:
+                self.room_peers[room].append(index)
+
+        self.staff_of = [allocation.staff_id.index for allocation in self.allocations]
+        self.tie_rank = list(range(len(self.allocations)))
+        self.rng.shuffle(self.tie_rank)
+        self.staff_peers = [
+            [peer for peer in staff_groups[allocation.staff_id.index] if peer != index]
+            for index, allocation in enumerate(self.allocations)
+        ]
+
+        # How many unassigned allocations still hold each (slot, room), and
+        # each teacher's remaining values per slot; value ordering reads
+        # these instead of scanning peer domains
+        self.room_support = defaultdict(int)
+        self.staff_support = defaultdict(int)
+        for index in range(len(self.allocations)):
+            self._count_domain(index, 1)
+        self.first_slot_of_day = {day_index * slots_per_day for day_index in range(len(self.days))}
+        self.last_slot_of_day = {
+            day_index * slots_per_day + slots_per_day - 1 for day_index in range(len(self.days))
+        }
+
+    def _count_domain(self, variable, sign):
+        """Add (1) or remove (-1) a variable's domain from the support counts"""
+        staff_index = self.allocations[variable].staff_id.index
+        for slot_index, rooms in self.domains[variable].items():
+            self.staff_support[staff_index, slot_index] += sign * len(rooms)
+            for room_index in rooms:
+                self.room_support[slot_index, room_index] += sign
+
+    def _order_values(self, variable):
+        """Values to try for a variable, in search order"""
+        domains = self.domains
+        if not self.forward_checking:
+            # Chronological mode keeps the original shuffled slot x room order,
+            # with rooms in the run's seeded order for their type and size
+            allocation = self.allocations[variable]
+            slots = [slot['index'] for slot in self._get_available_slots(allocation.staff_id)]
+            rooms = [room.index for room in self._get_suitable_rooms(allocation)]
+            self.rng.shuffle(slots)
+            return [(slot_index, room_index) for slot_index in slots for room_index in rooms]
+
+        # Values that rule out the fewest options of unassigned peers first;
+        # the variable's own values are still in the counts, so subtract them
+        domain = domains[variable]
+        staff_index = self.allocations[variable].staff_id.index
+        weights = self._get_slot_weights(staff_index)
+
+        def constraining(value):
+            slot_index, room_index = value
+            cost = self.staff_support[staff_index, slot_index] - len(domain[slot_index])
+            cost += self.room_support[slot_index, room_index] - 1
+            return cost, -weights[slot_index]
+
+        values = [
+            (slot_index, room_index)
+            for slot_index, rooms in domains[variable].items()
+            for room_index in rooms
+        ]
+        self.rng.shuffle(values)
+        values.sort(key=constraining)
+        return values
+
+    def _forward_check(self, variable, slot_index, room_index):
+        """Prune values the assignment rules out onto the trail.
+
+        Returns an allocation whose domain the pruning emptied, or None.
+        """
+        trail = self.trail
+        touched = set()
+        staff_of = self.staff_of
+        pruned_by = self.pruned_by
+
+        def prune(peer, pruned_slot, pruned_room):
+            rooms = self.domains[peer].get(pruned_slot)
+            if rooms and pruned_room in rooms:
+                rooms.remove(pruned_room)
+                self.domain_sizes[peer] -= 1
+                self.staff_support[staff_of[peer], pruned_slot] -= 1
+                self.room_support[pruned_slot, pruned_room] -= 1
+                pruned_by[peer][variable] += 1
+                trail.append((peer, pruned_slot, pruned_room, variable))
+                touched.add(peer)
+
+        # Same teacher, same slot
+        for peer in self.staff_peers[variable]:
+            if not self.assigned[peer]:
+                for room in list(self.domains[peer].get(slot_index, ())):
+                    prune(peer, slot_index, room)
+
+        # Same room, same slot; and the neighbouring slots of that room are
+        # closed to other departments
+        dept_id = self.allocations[variable].program_id.dept_id
+        has_next = slot_index not in self.last_slot_of_day
+        has_previous = slot_index not in self.first_slot_of_day
+        for peer in self.room_peers[room_index]:
+            if self.assigned[peer]:
+                continue
+            prune(peer, slot_index, room_index)
+            if self.allocations[peer].program_id.dept_id != dept_id:
+                if has_next:
+                    prune(peer, slot_index + 1, room_index)
+                if has_previous:
+                    prune(peer, slot_index - 1, room_index)
+
+        for peer in touched:
+            if not self.domain_sizes[peer]:
+                return peer
+        return None
+
+    def _undo_to(self, mark):
+        """Restore values pruned since the trail had ``mark`` entries"""
+        trail = self.trail
+        while len(trail) > mark:
+            peer, slot_index, room_index, pruner = trail.pop()
+            self.domains[peer][slot_index].add(room_index)
+            pruned = self.pruned_by[peer]
+            pruned[pruner] -= 1
+            if not pruned[pruner]:
+                del pruned[pruner]
+            self.domain_sizes[peer] += 1
+            self.staff_support[self.staff_of[peer], slot_index] += 1
+            self.room_support[slot_index, room_index] += 1
 
     def _generate_time_slots(self):
         slots = []
@@ -55,79 +610,149 @@ class BacktrackTimetableGenerator:
         return slots
 
     def _get_available_slots(self, staff):
-        available_slots = []
-        preferences = TeacherPreference.objects.filter(staff_id=staff)
-        for day in self.days:
-            for slot in self.time_slots:
-                weight = self._get_preference_weight(preferences, day, slot)
-                available_slots.append({
-                    'day': day,
-                    'start_time': slot['start_time'],
-                    'end_time': slot['end_time'],
-                    'weight': weight
-                })
-        return sorted(available_slots, key=lambda x: x['weight'], reverse=True)
-
-    def _get_preference_weight(self, preferences, day, slot):
-        for pref in preferences:
-            if pref.day_of_week == day and pref.start_time <= slot['start_time'] < pref.end_time:
-                return pref.preference_weight
+        """Week slots with the teacher's preference weight, most preferred first"""
+        available_slots = self.available_slots.get(staff.index)
+        if available_slots is None:
+            weights = self._get_slot_weights(staff.index)
+            available_slots = sorted(
+                (dict(slot, weight=weights[slot['index']]) for slot in self.week_slots),
+                key=lambda x: x['weight'], reverse=True
+            )
+            self.available_slots[staff.index] = available_slots
+        return list(available_slots)
+
+    def _get_slot_weights(self, staff_index):
+        """Preference weight of every week slot, indexed by slot index"""
+        weights = self.slot_weights.get(staff_index)
+        if weights is None:
+            weights = [
+                self._get_preference_weight(staff_index, slot['day'], slot)
+                for slot in self.week_slots
+            ]
+            self.slot_weights[staff_index] = weights
+        return weights
+
+    def _get_preference_weight(self, staff_index, day, slot):
+        start = to_minutes(slot['start_time'])
+        # Intervals are sorted by start, so the first one covering the
+        # slot wins and later ones cannot
+        for pref_start, pref_end, weight in self.preference_index[staff_index].get(day, ()):
+            if pref_start > start:
+                break
+            if start < pref_end:
+                return weight
         return 0
 
-    def _get_suitable_rooms(self, module):
-        program = Program.objects.get(modules=module)
-        return Room.objects.filter(
-            room_type=module.module_type,
-            capacity__gte=program.program_capacity
-        )
+    def _get_suitable_rooms(self, allocation):
+        """Rooms of the module's type that hold the class, in a seeded order"""
+        key = (allocation.module_id.module_type, allocation.class_id.class_capacity)
+        rooms = self.suitable_rooms.get(key)
+        if rooms is None:
+            rooms = [
+                room for room in self.instance.rooms
+                if room.room_type == key[0] and room.capacity >= key[1]
+            ]
+            self.rng.shuffle(rooms)
+            self.suitable_rooms[key] = rooms
+        return rooms
 
-    def _is_valid_assignment(self, module, staff, room, slot):
-        # Check for conflicts with existing timetable entries
-        for entry in self.timetable:
-            if entry['day_of_week'] == slot['day'] and self._time_overlap(entry, slot):
-                if entry['staff_id'] == staff or entry['room_id'] == room:
-                    return False
+    def _is_valid_assignment(self, allocation, staff, room, slot):
+        # Check for conflicts with existing timetable entries; slots are
+        # whole grid hours, so overlapping entries share a start
+        key = (slot['day'], slot['start_time'])
+        if staff.index in self.staff_busy[key] or room.index in self.room_busy[key]:
+            return False
 
         # Check for consecutive classes in the same room
         previous_slot = self._get_previous_slot(slot)
         if previous_slot:
-            previous_entry = next((e for e in self.timetable if e['day_of_week'] == slot['day'] and e['end_time'] == slot['start_time'] and e['room_id'] == room), None)
-            if previous_entry and previous_entry['module_id'].dept_id != module.dept_id:
+            previous_entry = self.room_ends.get((slot['day'], slot['start_time'], room.index))
+            if previous_entry and previous_entry['dept_id'] != allocation.program_id.dept_id:
                 return False
 
-        return True
+        # The rule holds both ways, whichever entry was placed first
+        next_slot = self._get_next_slot(slot)
+        if next_slot:
+            next_entry = self.room_ends.get((slot['day'], next_slot['end_time'], room.index))
+            if next_entry and next_entry['dept_id'] != allocation.program_id.dept_id:
+                return False
 
-    def _time_overlap(self, entry1, entry2):
-        return (entry1['start_time'] < entry2['end_time'] and entry2['start_time'] < entry1['end_time'])
+        return True
 
     def _get_previous_slot(self, slot):
-        index = self.time_slots.index(slot)
-        if index > 0:
+        index = self.slot_positions.get(slot['start_time'])
+        if index:
             return self.time_slots[index - 1]
         return None
 
-    def _add_to_timetable(self, module, staff, room, slot):
-        timetable_entry = Timetable(
-            module_id=module,
-            room_id=room,
-            staff_id=staff,
-            day_of_week=slot['day'],
-            start_time=slot['start_time'],
-            end_time=slot['end_time'],
-            semester=self.semester
-        )
-        self.timetable.append(timetable_entry)
+    def _get_next_slot(self, slot):
+        index = self.slot_positions.get(slot['start_time'])
+        if index is not None and index + 1 < len(self.time_slots):
+            return self.time_slots[index + 1]
+        return None
+
+    def _add_to_timetable(self, allocation, room, slot):
+        entry = {
+            'allocation': allocation,
+            'staff_id': allocation.staff_id,
+            'room_id': room,
+            'dept_id': allocation.program_id.dept_id,
+            'day_of_week': slot['day'],
+            'start_time': slot['start_time'],
+            'end_time': slot['end_time'],
+        }
+        self.timetable.append(entry)
+        key = (slot['day'], slot['start_time'])
+        self.staff_busy[key].add(allocation.staff_id.index)
+        self.room_busy[key].add(room.index)
+        self.room_ends[(slot['day'], slot['end_time'], room.index)] = entry
 
     def _remove_last_entry(self):
         if self.timetable:
-            self.timetable.pop()
+            entry = self.timetable.pop()
+            key = (entry['day_of_week'], entry['start_time'])
+            self.staff_busy[key].discard(entry['staff_id'].index)
+            self.room_busy[key].discard(entry['room_id'].index)
+            self.room_ends.pop((entry['day_of_week'], entry['end_time'], entry['room_id'].index), None)
 
     def save_timetable(self):
-        Timetable.objects.bulk_create(self.timetable)
+        with transaction.atomic():
+            version = TimetableVersion.objects.create()
+            Timetable.objects.bulk_create([
+                Timetable(
+                    version=version,
+                    allocation_id=entry['allocation'].allocation_id,
+                    module_id_id=entry['allocation'].module_id.module_id,
+                    room_id_id=entry['room_id'].room_id,
+                    staff_id_id=entry['staff_id'].staff_id,
+                    class_id_id=entry['allocation'].class_id.Class_id,
+                    class_stream=entry['allocation'].class_id.class_stream,
+                    day_of_week=entry['day_of_week'],
+                    start_time=entry['start_time'],
+                    end_time=entry['end_time'],
+                    semester=self.semester
+                )
+                for entry in self.timetable
+            ])
+        version.publish()
+
+class _Frame:
+    """One level of the explicit search stack"""
+    __slots__ = ('variable', 'values', 'position', 'mark', 'assigned', 'conflict')
+
+    def __init__(self, variable, values, mark):
+        self.variable = variable
+        self.values = values
+        self.position = 0
+        self.mark = mark
+        self.assigned = False
+        # Earlier variables responsible for this frame's failed values
+        self.conflict = set()
+
 
-def backtrack_timetable(academic_year, semester):
+def backtrack_timetable(academic_year, semester, workers=1):
     generator = BacktrackTimetableGenerator(academic_year, semester)
-    timetable = generator.generate()
+    timetable = generator.generate(workers)
     if timetable:
         generator.save_timetable()
         return True
@@ -0,0 +1,140 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection, transaction
+
+from .backtrack import BacktrackTimetableGenerator
+from .generator import TimetableGenerator
+from .instance import ProblemInstance
+from .synthetic import SyntheticConfig, build_institution
+
+SIZES = ('small', 'medium', 'large')
+
+# Academic year the synthetic classes are created in, never a real one
+SYNTHETIC_YEAR = 'synthetic'
+
+
+class _Rollback(Exception):
+    """Raised to throw away the synthetic rows a run created"""
+
+
+@contextmanager
+def _measure(record: Dict):
+    """Time, count queries and trace peak Python memory for a block"""
+    queries = [0]
+
+    def count_queries(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_queries):
+            yield
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        record['runtime'] = round(time.perf_counter() - start, 4)
+        record['queries'] = queries[0]
+        record['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+
+def benchmark_greedy(config: SyntheticConfig, optimization_budget: float) -> Dict:
+    """Run the full TimetableGenerator pipeline, saving an unpublished version"""
+    record = {'generator': 'greedy'}
+    with _measure(record):
+        generator = TimetableGenerator(
+            seed=config.seed, optimization_budget=optimization_budget, publish=False,
+            instance=ProblemInstance.load(config.academic_year, config.semester)
+        )
+        generator.generate_timetable()
+        score = generator.score()
+        record['unscheduled'] = score.unscheduled
+        record['penalty'] = score.penalty
+    return record
+
+
+def benchmark_backtrack(config: SyntheticConfig, time_limit: float = 60.0) -> Dict:
+    """Solve with BacktrackTimetableGenerator without saving"""
+    record = {'generator': 'backtrack'}
+    with _measure(record):
+        generator = BacktrackTimetableGenerator(
+            config.academic_year, config.semester, seed=config.seed, time_limit=time_limit
+        )
+        timetable = generator.generate()
+        record['unscheduled'] = 0 if timetable is not None else len(generator.allocations)
+        record['status'] = generator.status
+        record['nodes'] = generator.nodes
+    return record
+
+
+def run_size(
+    size: str,
+    seed: int = 0,
+    optimization_budget: float = 2.0,
+    generators: Iterable[str] = ('greedy', 'backtrack')
+) -> Dict:
+    """Build one synthetic institution, benchmark each generator on it and roll back
+
+    Both generators only see allocations of the synthetic academic year,
+    but rooms are shared with whatever else is in the database, so the
+    benchmark command runs this against a throwaway test database.
+    """
+    config = SyntheticConfig.preset(size, seed)
+    config.academic_year = SYNTHETIC_YEAR
+    result = {'size': size, 'seed': seed, 'runs': []}
+    try:
+        with transaction.atomic():
+            result['dataset'] = build_institution(config)
+            if 'greedy' in generators:
+                result['runs'].append(benchmark_greedy(config, optimization_budget))
+            if 'backtrack' in generators:
+                result['runs'].append(benchmark_backtrack(config))
+            raise _Rollback
+    except _Rollback:
+        pass
+    return result
+
+
+def run_benchmarks(
+    sizes: Iterable[str] = SIZES,
+    seed: int = 0,
+    optimization_budget: float = 2.0,
+    generators: Iterable[str] = ('greedy', 'backtrack')
+) -> Dict:
+    return {
+        'seed': seed,
+        'optimization_budget': optimization_budget,
+        'results': [
+            run_size(size, seed, optimization_budget, generators) for size in sizes
+        ],
+    }
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """Runs that got slower, chattier or worse than the baseline"""
+    previous = {
+        (result['size'], run['generator']): run
+        for result in baseline.get('results', [])
+        for run in result['runs']
+    }
+    regressions = []
+    for result in current['results']:
+        for run in result['runs']:
+            old: Optional[Dict] = previous.get((result['size'], run['generator']))
+            if old is None or 'error' in old or 'error' in run:
+                continue
+            label = f"{result['size']}/{run['generator']}"
+            if run['runtime'] > old['runtime'] * (1 + tolerance):
+                regressions.append(f"{label}: runtime {old['runtime']}s -> {run['runtime']}s")
+            if run['queries'] > old['queries']:
+                regressions.append(f"{label}: queries {old['queries']} -> {run['queries']}")
+            if run.get('unscheduled', 0) > old.get('unscheduled', 0):
+                regressions.append(
+                    f"{label}: unscheduled {old.get('unscheduled', 0)} -> {run.get('unscheduled', 0)}"
+                )
+    return regressions
@@ -0,0 +1,152 @@
+import heapq
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Set, Tuple
+
+
+class SlotConflict(NamedTuple):
+    """Two placed slots that overlap on the same staff, room or class"""
+    conflict_type: str
+    resource_id: Hashable
+    slot_1: Any
+    slot_2: Any
+
+
+# Conflict model choices for each in-memory conflict type
+MODEL_CONFLICT_TYPES = {
+    'staff': 'Teacher',
+    'Room': 'Room',
+    'Stream': 'Class',
+}
+
+
+def find_overlaps(intervals: Iterable[Tuple[Any, Any, Any]]) -> List[Tuple[Any, Any]]:
+    """All overlapping pairs among half-open (start, end, item) intervals.
+
+    Intervals are sorted once by start and swept while keeping a heap of
+    the ones still open, so the cost is O(n log n + k) for k overlaps.
+    """
+    ordered = sorted(
+        (start, end, index, item)
+        for index, (start, end, item) in enumerate(intervals)
+    )
+    active: List[Tuple[Any, int, Any]] = []
+    pairs = []
+
+    for start, end, index, item in ordered:
+        # Anything that ended by now cannot overlap this or later intervals
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            pairs.append((other, item))
+        heapq.heappush(active, (end, index, item))
+
+    return pairs
+
+
+class ConflictDetector:
+    """Sweep-line overlap detection grouped by (resource, day)"""
+
+    def detect(
+        self,
+        conflict_type: str,
+        entries: Iterable[Tuple[Hashable, str, Any, Any, Any]]
+    ) -> List[SlotConflict]:
+        """Conflicts among (resource_id, day, start, end, item) entries"""
+        grouped = defaultdict(list)
+        for resource_id, day, start, end, item in entries:
+            grouped[(resource_id, day)].append((start, end, item))
+
+        conflicts = []
+        for (resource_id, _), intervals in grouped.items():
+            if len(intervals) < 2:
+                continue
+            for item1, item2 in find_overlaps(intervals):
+                conflicts.append(SlotConflict(conflict_type, resource_id, item1, item2))
+        return conflicts
+
+    def detect_slots(self, conflict_type: str, resource_id: Hashable, slots: Iterable) -> List[SlotConflict]:
+        """Conflicts among the slots booked on one resource"""
+        return self.detect(
+            conflict_type,
+            ((resource_id, slot.day, slot.start_time, slot.end_time, slot) for slot in slots)
+        )
+
+    def audit_timetable(self, entries: Iterable) -> List[SlotConflict]:
+        """Staff, room and class stream clashes among persisted Timetable rows"""
+        entries = list(entries)
+        conflicts = self.detect(
+            ConflictTracker.STAFF,
+            ((e.staff_id_id, e.day_of_week, e.start_time, e.end_time, e) for e in entries)
+        )
+        conflicts.extend(self.detect(
+            ConflictTracker.ROOM,
+            ((e.room_id_id, e.day_of_week, e.start_time, e.end_time, e) for e in entries)
+        ))
+        conflicts.extend(self.detect(
+            ConflictTracker.STREAM,
+            (((e.class_id_id, e.class_stream), e.day_of_week, e.start_time, e.end_time, e)
+             for e in entries if e.class_id_id is not None)
+        ))
+        return conflicts
+
+
+class ConflictTracker:
+    """Incrementally maintained conflict set for a ResourceManager.
+
+    Placements and moves mark the staff, room and class they touch as
+    dirty; only dirty resources are re-examined when the conflict list is
+    requested, so resolving k conflicts costs work proportional to k
+    rather than to the size of the timetable.
+    """
+
+    STAFF = 'staff'
+    ROOM = 'Room'
+    STREAM = 'Stream'
+
+    def __init__(self, resource_manager):
+        self.resource_manager = resource_manager
+        self.detector = ConflictDetector()
+        self._conflicts: Dict[Tuple[str, int], List[SlotConflict]] = {}
+        self._dirty: Set[Tuple[str, int]] = set()
+
+    def touch(self, staff_id: int, class_id: int, room_id: int):
+        """Mark the resources of a placement as needing a re-check"""
+        self._dirty.add((self.STAFF, staff_id))
+        self._dirty.add((self.STREAM, class_id))
+        if room_id is not None:
+            self._dirty.add((self.ROOM, room_id))
+
+    def conflicts(self) -> List[SlotConflict]:
+        """Current conflicts, refreshing only resources touched since last call"""
+        while self._dirty:
+            key = self._dirty.pop()
+            found = self._detect(*key)
+            if found:
+                self._conflicts[key] = found
+            else:
+                self._conflicts.pop(key, None)
+
+        return [
+            conflict
+            for conflicts in self._conflicts.values()
+            for conflict in conflicts
+        ]
+
+    def _detect(self, conflict_type: str, resource_id: int) -> List[SlotConflict]:
+        manager = self.resource_manager
+        if conflict_type == self.STAFF:
+            clash = manager.staff_clashes.get(resource_id, 0)
+            schedule = manager.staff_schedule.get(resource_id, [])
+        elif conflict_type == self.ROOM:
+            clash = manager.room_clashes.get(resource_id, 0)
+            schedule = manager.room_schedule.get(resource_id, [])
+        else:
+            clash = manager.class_clashes.get(resource_id, 0)
+            schedule = manager.class_schedule.get(resource_id, [])
+
+        # No overlapping bits means nothing to compare
+        if not clash:
+            return []
+
+        slots = [slot for slot in schedule if manager.slot_mask(slot) & clash]
+        return self.detector.detect_slots(conflict_type, resource_id, slots)
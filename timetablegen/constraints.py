@@ -0,0 +1,39 @@
+from datetime import time, timedelta
+from typing import Dict
+
+
+class TimetableConstraints:
+    """Institution-wide scheduling rules shared by the generators"""
+    DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+    # Teaching day and breaks
+    DAY_START = time(8, 0)
+    DAY_END = time(17, 0)
+    BREAKFAST_START = time(10, 0)
+    BREAKFAST_END = time(11, 30)
+    LUNCH_START = time(13, 0)
+    LUNCH_END = time(14, 30)
+
+    # Session lengths
+    MIN_DURATION = timedelta(hours=2)
+    MAX_DURATION = timedelta(hours=3)
+
+    # Width of one occupancy unit in minutes; every booking is rounded
+    # outwards to whole units
+    SLOT_MINUTES = 15
+    UNITS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+    DEFAULT_PROGRAM_CONSTRAINTS = {
+        'start_time': DAY_START,
+        'end_time': DAY_END,
+    }
+
+    # Per-program overrides of the teaching window, keyed by program name
+    PROGRAM_CONSTRAINTS: Dict[str, Dict[str, time]] = {}
+
+    DAY_INDEX = {day: index for index, day in enumerate(DAYS)}
+
+    @classmethod
+    def for_program(cls, program_name: str) -> Dict[str, time]:
+        """Teaching window for a program, falling back to the default day"""
+        return cls.PROGRAM_CONSTRAINTS.get(program_name, cls.DEFAULT_PROGRAM_CONSTRAINTS)
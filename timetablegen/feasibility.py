@@ -0,0 +1,87 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .resources import RoomCatalogue
+from .slotgrid import SlotGrid
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements.txt
+    np = None
+
+
+class FeasibilityMatrix:
+    """Static feasibility of every allocation against every session.
+
+    Columns are the distinct (start, end) sessions any program window and
+    duration allows; a cell is true when the session lies on the
+    allocation's own lattice (window, duration and break rules) and some
+    room of the module's type holds the class. Every day shares the same
+    teaching windows, so the day axis is implied. Busy staff, classes and
+    rooms change during the search and are still checked per probe.
+
+    Built with NumPy when it is installed: one gather of per-group rows
+    combined with a broadcast room fit. Without it the same answers come
+    from per-group column lists.
+    """
+
+    def __init__(
+        self,
+        allocations: Sequence,
+        rooms: RoomCatalogue,
+        slot_grid: SlotGrid,
+        duration_of: Callable[[object], int]
+    ):
+        groups: Dict[Tuple[str, int], int] = {}
+        group_of: List[int] = []
+        for allocation in allocations:
+            key = (
+                allocation.program_id.program_name,
+                slot_grid.duration_minutes(duration_of(allocation))
+            )
+            group_of.append(groups.setdefault(key, len(groups)))
+
+        group_sessions = [slot_grid.sessions(*key) for key in groups]
+        self.columns: List[Tuple[int, int]] = sorted({
+            session for sessions in group_sessions for session in sessions
+        })
+        column_of = {session: index for index, session in enumerate(self.columns)}
+        group_columns = [
+            [column_of[session] for session in sessions] for sessions in group_sessions
+        ]
+
+        room_fit = [
+            bool(rooms.candidates(
+                allocation.module_id.module_type, allocation.class_id.class_capacity
+            ))
+            for allocation in allocations
+        ]
+
+        self._row_of = {allocation.index: row for row, allocation in enumerate(allocations)}
+        if np is not None:
+            members = np.zeros((len(groups), len(self.columns)), dtype=bool)
+            for group, columns in enumerate(group_columns):
+                members[group, columns] = True
+            self.matrix = (
+                members[np.asarray(group_of, dtype=np.intp)] &
+                np.asarray(room_fit, dtype=bool)[:, None]
+            )
+            self._rows = None
+        else:
+            self.matrix = None
+            self._rows = [
+                group_columns[group] if fit else []
+                for group, fit in zip(group_of, room_fit)
+            ]
+        self._sessions: Dict[int, List[Tuple[int, int]]] = {}
+
+    def sessions(self, allocation) -> List[Tuple[int, int]]:
+        """Feasible (start, end) sessions of an allocation on any day"""
+        row = self._row_of[allocation.index]
+        sessions = self._sessions.get(row)
+        if sessions is None:
+            if self.matrix is not None:
+                columns = np.flatnonzero(self.matrix[row]).tolist()
+            else:
+                columns = self._rows[row]
+            sessions = self._sessions[row] = [self.columns[column] for column in columns]
+        return sessions
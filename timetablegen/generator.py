@@ -1,17 +1,28 @@
-from datetime import datetime, timedelta, time
+from datetime import timedelta
 import random
-from typing import Dict, List, Set, Tuple, Optional
-from django.db import transaction
-from django.core.cache import cache
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from django.db import connections, transaction
 from collections import defaultdict
 from dataclasses import dataclass
 import heapq
 
-from .models import (
-    Timetable, Module, Room, Staff, Class, 
-    ClassModuleAllocation, Conflict,
-    Program
+from .models import Timetable, TimetableVersion
+from .conflicts import ConflictTracker, SlotConflict
+from .constraints import TimetableConstraints
+from .profiling import GenerationProfiler
+from . import resultcache
+from .parallel import (
+    init_worker, partition_allocations, solve_partition, solve_seeded
 )
+from .feasibility import FeasibilityMatrix
+from .instance import AllocationRecord, ProblemInstance, RoomRecord
+from .localsearch import LocalSearch
+from .resources import ResourceManager, RoomCatalogue
+from .scoring import ScheduleScore, schedule_penalty
+from .slotgrid import SlotGrid
+from .solution import SolutionStore, TimeSlot
 
 @dataclass
 class SchedulingPriority:
@@ -20,95 +31,314 @@ class SchedulingPriority:
     MEDIUM = 2  # Regular modules
     LOW = 1     # Optional modules
 
-class TimeSlot:
-    def __init__(self, day: str, start_time: time, end_time: time):
-        self.day = day
-        self.start_time = start_time
-        self.end_time = end_time
-
-    def overlaps(self, other: 'TimeSlot') -> bool:
-        return self.day == other.day and (
-            self.start_time < other.end_time and other.start_time < self.end_time
-        )
-
 class TimetableGenerator:
     """Comprehensive timetable generation system"""
+
+    DEFAULT_OPTIMIZATION_BUDGET = 10.0
     
-    def __init__(self):
+    def __init__(
+        self,
+        instance: Optional[ProblemInstance] = None,
+        seed: Optional[int] = None,
+        optimization_budget: Optional[float] = None,
+        on_progress: Optional[Callable[[str, float], None]] = None,
+        publish: bool = True,
+        use_cache: bool = False,
+        trace_memory: bool = False
+    ):
+        # A seed switches on randomized tie-breaking, slot order and room
+        # choice for multi-start runs
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else None
+
+        # Called with (phase, fraction done) as generation advances
+        self.on_progress = on_progress
+
+        # Per-phase timings and search counters of this run; tracing heap
+        # peaks is opt-in as it slows every phase down
+        self.profiler = GenerationProfiler(trace_memory=trace_memory)
+
+        # Saved timetables become a new version, made active when publishing
+        self.publish = publish
+        self.version: Optional[TimetableVersion] = None
+
+        # Reuse the stored result of an earlier run on identical inputs
+        self.use_cache = use_cache
+        self.cache_hit = False
+
+        # Wall-clock seconds the local search may spend improving a schedule
+        self.optimization_budget = (
+            optimization_budget if optimization_budget is not None
+            else self.DEFAULT_OPTIMIZATION_BUDGET
+        )
+
         self.resource_manager = ResourceManager()
-        self.conflict_detector = ConflictDetector()
+        self.slot_grid = SlotGrid()
+        self.conflict_tracker = ConflictTracker(self.resource_manager)
         
         # Track allocations and workloads
         self.staff_workload: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
         self.stream_allocations: Dict[int, List[TimeSlot]] = defaultdict(list)
         self.room_type_usage: Dict[str, Dict[int, List[TimeSlot]]] = defaultdict(lambda: defaultdict(list))
+
+        # Placed slots back to their allocation and room
+        self.slot_allocations: Dict[TimeSlot, AllocationRecord] = {}
+        self.slot_rooms: Dict[TimeSlot, RoomRecord] = {}
+        # The same slots in a list for random picks, and each one's position
+        self.placed_slots: List[TimeSlot] = []
+        self.slot_positions: Dict[TimeSlot, int] = {}
         
-        # Cache frequently accessed data
-        self.module_credits = self._cache_module_credits()
+        # Everything the solver reads, loaded once; worker processes are
+        # handed the parent's instance so they never query the database
+        self.instance = instance if instance is not None else ProblemInstance.load()
+        self.room_catalogue = RoomCatalogue(self.instance.rooms)
         self.room_capacities = self._cache_room_capacities()
+
+        # Static allocation x session feasibility, built on first use
+        self.feasibility: Optional[FeasibilityMatrix] = None
         
-        # Scheduling queues
-        self.pending_allocations: List[Tuple[int, ClassModuleAllocation]] = []
-        self.failed_allocations: List[Tuple[int, ClassModuleAllocation]] = []
+        # Allocations of this run by id, filled by _prepare_allocations
+        self.allocations: Dict[int, AllocationRecord] = {}
 
-    def _cache_module_credits(self) -> Dict[int, int]:
-        """Cache module credits for quick access"""
-        return {
-            module.module_id: module.module_credit 
-            for module in Module.objects.all()
-        }
+        # Scheduling queues
+        self.pending_allocations: List[Tuple[int, Tuple[float, int], AllocationRecord]] = []
+        self.failed_allocations: List[Tuple[int, AllocationRecord]] = []
 
     def _cache_room_capacities(self) -> Dict[int, int]:
         """Cache room capacities for quick access"""
         return {
-            room.room_id: room.capacity 
-            for room in Room.objects.all()
+            room_id: room.capacity
+            for room_id, room in self.room_catalogue.rooms.items()
         }
 
-    def generate_timetable(self):
-        """Main timetable generation process"""
+    def generate_timetable(self, workers: Optional[int] = None, starts: Optional[int] = None):
+        """Main timetable generation process
+
+        With ``workers`` above one, allocations are split into partitions
+        sharing no staff or class and solved in a process pool. With
+        ``starts`` above one, that many randomized greedy runs are made
+        instead and the best scoring schedule is kept. With ``use_cache``
+        set, a result stored for identical inputs is reused.
+        """
         try:
-            with transaction.atomic():
-                # 1. Prepare allocations
+            # 1. Prepare allocations
+            with self._phase('prepare', 0.0):
                 self._prepare_allocations()
-                
+                cache_key = (
+                    self._cache_key(workers, starts)
+                    if self.use_cache and resultcache.available() else None
+                )
+                cached = resultcache.get_result(cache_key) if cache_key else None
+
+            if cached is not None:
+                # 2-3. Identical inputs were solved before
+                with self._phase('cached', 0.1):
+                    self._load_cached_result(*cached)
+            elif starts and starts > 1:
+                # 2-3. Best of several seeded runs
+                with self._phase('multistart', 0.1):
+                    self._generate_multistart(starts, workers)
+            elif workers and workers > 1:
+                # 2-3. Solve independent partitions in parallel and merge
+                with self._phase('partitioned', 0.1):
+                    self._generate_partitioned(workers)
+            else:
                 # 2. Generate initial schedule
-                self._generate_initial_schedule()
+                with self._phase('initial_schedule', 0.1):
+                    self._generate_initial_schedule()
                 
                 # 3. Optimize and resolve conflicts
-                self._optimize_schedule()
-                
-                # 4. Handle failed allocations
+                with self._phase('optimize', 0.3):
+                    self._optimize_schedule()
+
+            # 4. Handle failed allocations
+            with self._phase('failed_allocations', 0.8):
                 self._handle_failed_allocations()
-                
-                # 5. Validate final schedule
+            
+            # 5. Validate final schedule
+            with self._phase('validate', 0.9):
                 if not self._validate_final_schedule():
                     raise ValueError("Failed to generate valid timetable")
-                
-                # 6. Save to database
+
+            # Only a schedule that passed validation is reused
+            if cache_key and cached is None:
+                resultcache.store_result(
+                    cache_key, self.export_placements(), self.failed_allocation_ids()
+                )
+            
+            # 6. Save to database
+            with self._phase('save', 0.95):
                 self._save_timetable()
+            self._report_progress('done', 1.0)
                 
         except Exception as e:
             print(f"Timetable generation failed: {str(e)}")
             raise
 
+    def _cache_key(self, workers: Optional[int], starts: Optional[int]) -> str:
+        return resultcache.fingerprint(self.instance, {
+            'seed': self.seed,
+            'workers': workers,
+            'starts': starts,
+            'optimization_budget': self.optimization_budget,
+        })
+
+    def _load_cached_result(self, placements: SolutionStore, failed_ids: List[int]):
+        self.pending_allocations = []
+        self._import_placements(placements)
+        for allocation_id in failed_ids:
+            self.failed_allocations.append(
+                (SchedulingPriority.HIGH, self.allocations[allocation_id])
+            )
+        self.cache_hit = True
+
+    @contextmanager
+    def _phase(self, name: str, progress: float):
+        """Report progress and profile one generation phase"""
+        self._report_progress(name, progress)
+        with self.profiler.phase(name):
+            yield
+
+    def _report_progress(self, phase: str, progress: float):
+        if self.on_progress:
+            self.on_progress(phase, progress)
+
     def _prepare_allocations(self):
         """Prepare and prioritize allocations"""
-        allocations = ClassModuleAllocation.objects.select_related(
-            'class_id', 'module_id', 'staff_id', 'program_id'
-        ).all()
+        self._load_allocations(self.instance.allocations)
 
-        # Group allocations by program and prioritize
+    def _load_allocations(self, allocations: Iterable[AllocationRecord]):
+        """Register allocations and queue them by priority"""
         for allocation in allocations:
+            self.allocations[allocation.allocation_id] = allocation
             priority = self._calculate_priority(allocation)
-            heapq.heappush(self.pending_allocations, (-priority, allocation))
+            heapq.heappush(
+                self.pending_allocations,
+                (-priority, self._tie_break(allocation), allocation)
+            )
+
+    def _tie_break(self, allocation: AllocationRecord) -> Tuple[float, int]:
+        """Heap order among equal priorities, random when seeded"""
+        jitter = self.rng.random() if self.rng else 0.0
+        return (jitter, allocation.allocation_id)
+
+    def _generate_partitioned(self, workers: int):
+        """Solve staff/class-disjoint partitions in worker processes"""
+        partitions = partition_allocations(self.allocations.values(), workers)
+        if len(partitions) < 2:
+            self._generate_initial_schedule()
+            self._optimize_schedule()
+            return
+
+        # Workers schedule from their own queues
+        self.pending_allocations = []
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(partitions)),
+            initializer=init_worker
+        ) as pool:
+            futures = [
+                pool.submit(
+                    solve_partition, self.instance,
+                    [allocation.allocation_id for allocation in partition],
+                    self.optimization_budget
+                )
+                for partition in partitions
+            ]
+            for future in futures:
+                placements, failed_ids, counters = future.result()
+                self.profiler.merge(counters)
+                self._import_placements(placements)
+                for allocation_id in failed_ids:
+                    self.failed_allocations.append(
+                        (SchedulingPriority.HIGH, self.allocations[allocation_id])
+                    )
+
+        # Partitions picked rooms independently, repair the clashes
+        self._resolve_conflicts()
 
-    def _calculate_priority(self, allocation: ClassModuleAllocation) -> int:
+    def _generate_multistart(self, starts: int, workers: Optional[int] = None):
+        """Run seeded greedy variants in worker processes and keep the best"""
+        self.pending_allocations = []
+        allocation_ids = list(self.allocations)
+        base_seed = self.seed if self.seed is not None else 0
+
+        connections.close_all()
+        best = None
+        with ProcessPoolExecutor(
+            max_workers=min(workers or starts, starts),
+            initializer=init_worker
+        ) as pool:
+            futures = [
+                pool.submit(
+                    solve_seeded, self.instance, allocation_ids,
+                    base_seed + index, self.optimization_budget
+                )
+                for index in range(starts)
+            ]
+            for future in futures:
+                result = future.result()
+                # Every start did its share of the probing
+                self.profiler.merge(result[3])
+                if best is None or result[2] < best[2]:
+                    best = result
+
+        placements, failed_ids, _, _ = best
+        self._import_placements(placements)
+        for allocation_id in failed_ids:
+            self.failed_allocations.append(
+                (SchedulingPriority.HIGH, self.allocations[allocation_id])
+            )
+
+    def score(self) -> ScheduleScore:
+        """Unscheduled allocations first, then soft-constraint penalties"""
+        unscheduled = len({
+            allocation.allocation_id for _, allocation in self.failed_allocations
+        })
+        room_of = lambda slot: self.slot_rooms[slot].room_id
+        penalty = (
+            schedule_penalty(self.resource_manager.staff_schedule, room_of) +
+            schedule_penalty(self.resource_manager.class_schedule, room_of)
+        )
+        return ScheduleScore(unscheduled, penalty)
+
+    def export_placements(self) -> SolutionStore:
+        """Placed slots in compact columns that can cross process boundaries"""
+        store = SolutionStore()
+        for slot, allocation in self.slot_allocations.items():
+            store.append(
+                allocation.index,
+                slot.day_index,
+                slot.start_minute,
+                slot.end_minute,
+                self.slot_rooms[slot].index
+            )
+        return store
+
+    def failed_allocation_ids(self) -> List[int]:
+        return [allocation.allocation_id for _, allocation in self.failed_allocations]
+
+    def _import_placements(self, placements: SolutionStore):
+        """Place slots exported by :meth:`export_placements`"""
+        allocations = self.instance.allocations
+        rooms = self.instance.rooms
+        for allocation_index, day_index, start, end, room_index in placements:
+            self._place(
+                allocations[allocation_index],
+                TimeSlot.from_minutes(day_index, start, end),
+                rooms[room_index]
+            )
+
+    def _make_slot(self, day: str, start_minute: int, end_minute: int) -> TimeSlot:
+        return TimeSlot.from_minutes(TimetableConstraints.DAY_INDEX[day], start_minute, end_minute)
+
+    def _calculate_priority(self, allocation: AllocationRecord) -> int:
         """Calculate scheduling priority for an allocation"""
         base_priority = SchedulingPriority.MEDIUM
         
         # Adjust priority based on module credits
-        credit = self.module_credits.get(allocation.module_id.module_id, 10)
+        credit = allocation.module_id.module_credit
         if credit > 14:
             base_priority = SchedulingPriority.HIGH
         elif credit < 8:
@@ -127,7 +357,7 @@ class TimetableGenerator:
     def _generate_initial_schedule(self):
         """Generate initial schedule using greedy algorithm"""
         while self.pending_allocations:
-            _, allocation = heapq.heappop(self.pending_allocations)
+            _, _, allocation = heapq.heappop(self.pending_allocations)
             
             # Find suitable time slots
             possible_slots = self._find_possible_slots(allocation)
@@ -141,50 +371,110 @@ class TimetableGenerator:
             if not success:
                 self.failed_allocations.append((SchedulingPriority.HIGH, allocation))
 
-    def _find_possible_slots(self, allocation: ClassModuleAllocation) -> List[TimeSlot]:
+    def _find_possible_slots(self, allocation: AllocationRecord) -> List[TimeSlot]:
         """Find all possible time slots for an allocation"""
         possible_slots = []
-        program_constraints = TimetableConstraints.PROGRAM_CONSTRAINTS[
-            allocation.program_id.program_name
-        ]
 
-        for day in TimetableConstraints.DAYS:
-            current_time = program_constraints['start_time']
-            
-            while current_time < program_constraints['end_time']:
-                # Skip break times
-                if (TimetableConstraints.BREAKFAST_START <= current_time < 
-                    TimetableConstraints.BREAKFAST_END):
-                    current_time = TimetableConstraints.BREAKFAST_END
-                    continue
-                    
-                if (TimetableConstraints.LUNCH_START <= current_time < 
-                    TimetableConstraints.LUNCH_END):
-                    current_time = TimetableConstraints.LUNCH_END
-                    continue
-
-                # Calculate end time based on module credits
-                duration = self._calculate_duration(allocation)
-                end_time = (datetime.combine(datetime.today(), current_time) + 
-                           duration).time()
-
-                if end_time > program_constraints['end_time']:
-                    break
+        # Window, duration, break and room fit are settled up front
+        sessions = self._feasible_sessions(allocation)
+        for day_index in range(len(TimetableConstraints.DAYS)):
+            for start, end in sessions:
+                slot = TimeSlot.from_minutes(day_index, start, end)
 
-                slot = TimeSlot(day, current_time, end_time)
-                
                 # Check availability
                 if self._is_slot_available(allocation, slot):
                     possible_slots.append(slot)
 
-                # Move to next potential slot
-                current_time = end_time
-
         return possible_slots
 
-    def _calculate_duration(self, allocation: ClassModuleAllocation) -> timedelta:
+    def _feasible_sessions(self, allocation: AllocationRecord) -> List[Tuple[int, int]]:
+        """Sessions an allocation could ever use, ignoring current bookings"""
+        if self.feasibility is None:
+            self.feasibility = FeasibilityMatrix(
+                self.instance.allocations, self.room_catalogue,
+                self.slot_grid, self._calculate_duration
+            )
+        return self.feasibility.sessions(allocation)
+
+    def _schedule_allocation(
+        self,
+        allocation: AllocationRecord,
+        possible_slots: List[TimeSlot]
+    ) -> bool:
+        """Place an allocation in the first slot that still has a free room"""
+        if self.rng:
+            possible_slots = list(possible_slots)
+            self.rng.shuffle(possible_slots)
+
+        for slot in possible_slots:
+            room = self._choose_room(allocation, slot)
+            if room is not None:
+                self._place(allocation, slot, room)
+                return True
+        return False
+
+    def _place(self, allocation: AllocationRecord, slot: TimeSlot, room: RoomRecord):
+        """Record a placement and mark its staff, class and room as busy"""
+        staff_id = allocation.staff_id.staff_id
+        class_id = allocation.class_id.Class_id
+        self.resource_manager.book(staff_id, class_id, room.room_id, slot)
+        self.conflict_tracker.touch(staff_id, class_id, room.room_id)
+        self.stream_allocations[allocation.allocation_id].append(slot)
+        self.room_type_usage[room.room_type][room.room_id].append(slot)
+        self.slot_allocations[slot] = allocation
+        self.slot_rooms[slot] = room
+        self.slot_positions[slot] = len(self.placed_slots)
+        self.placed_slots.append(slot)
+
+    def _unplace(self, slot: TimeSlot) -> Optional[AllocationRecord]:
+        """Remove a placed slot and free its staff, class and room"""
+        allocation = self.slot_allocations.pop(slot, None)
+        if allocation is None:
+            return None
+        room = self.slot_rooms.pop(slot, None)
+
+        # The last slot takes the freed position
+        position = self.slot_positions.pop(slot)
+        last = self.placed_slots.pop()
+        if last is not slot:
+            self.placed_slots[position] = last
+            self.slot_positions[last] = position
+        room_id = room.room_id if room else None
+
+        staff_id = allocation.staff_id.staff_id
+        class_id = allocation.class_id.Class_id
+        self.resource_manager.release(staff_id, class_id, room_id, slot)
+        self.conflict_tracker.touch(staff_id, class_id, room_id)
+
+        slots = self.stream_allocations[allocation.allocation_id]
+        slots.remove(slot)
+        if not slots:
+            del self.stream_allocations[allocation.allocation_id]
+        if room:
+            self.room_type_usage[room.room_type][room.room_id].remove(slot)
+        return allocation
+
+    def _try_reschedule_slot_to(self, slot: TimeSlot, new_slot: TimeSlot) -> bool:
+        """Move a placed slot to a new time, keeping it if no room is free"""
+        allocation = self._get_allocation_for_slot(slot)
+        if allocation is None:
+            return False
+        room = self._find_available_room(allocation, new_slot)
+        if room is None:
+            return False
+        self._unplace(slot)
+        self._place(allocation, new_slot, room)
+        return True
+
+    def _get_allocation_for_slot(self, slot: TimeSlot) -> Optional[AllocationRecord]:
+        return self.slot_allocations.get(slot)
+
+    def _get_room_for_slot(self, slot: TimeSlot) -> Optional[RoomRecord]:
+        return self.slot_rooms.get(slot)
+
+    def _calculate_duration(self, allocation: AllocationRecord) -> timedelta:
         """Calculate class duration based on module credits"""
-        credit = self.module_credits.get(allocation.module_id.module_id, 10)
+        credit = allocation.module_id.module_credit
         
         if credit <= 10:
             return TimetableConstraints.MIN_DURATION
@@ -193,8 +483,9 @@ class TimetableGenerator:
         else:
             return timedelta(hours=2, minutes=30)
 
-    def _is_slot_available(self, allocation: ClassModuleAllocation, slot: TimeSlot) -> bool:
+    def _is_slot_available(self, allocation: AllocationRecord, slot: TimeSlot) -> bool:
         """Check if a time slot is available for all resources"""
+        self.profiler.slots_probed += 1
         return (
             self.resource_manager.is_staff_available(
                 allocation.staff_id.staff_id, slot
@@ -207,240 +498,86 @@ class TimetableGenerator:
 
     def _find_available_room(
         self, 
-        allocation: ClassModuleAllocation, 
+        allocation: AllocationRecord, 
         slot: TimeSlot
-    ) -> Optional[Room]:
-        """Find an available room suitable for the allocation"""
-        # Get suitable rooms based on module type and class size
-        suitable_rooms = Room.objects.filter(
-            room_type=allocation.module_id.module_type,
-            capacity__gte=allocation.class_id.class_capacity
+    ) -> Optional[RoomRecord]:
+        """Find the smallest free room suitable for the allocation"""
+        # Rooms come from the per-run catalogue, never from a query per probe
+        is_room_available = self.resource_manager.is_room_available
+        profiler = self.profiler
+
+        def is_free(room_id: int) -> bool:
+            profiler.rooms_probed += 1
+            return is_room_available(room_id, slot)
+
+        return self.room_catalogue.find_free(
+            allocation.module_id.module_type,
+            allocation.class_id.class_capacity,
+            is_free
         )
 
-        # Check availability for each room
-        for room in suitable_rooms:
+    def _choose_room(
+        self,
+        allocation: AllocationRecord,
+        slot: TimeSlot,
+        spread: int = 3
+    ) -> Optional[RoomRecord]:
+        """Smallest free room, or a random one of the smallest few when seeded"""
+        if not self.rng:
+            return self._find_available_room(allocation, slot)
+
+        free_rooms = []
+        for room in self.room_catalogue.candidates(
+            allocation.module_id.module_type,
+            allocation.class_id.class_capacity
+        ):
             if self.resource_manager.is_room_available(room.room_id, slot):
-                return room
-
-        return None
+                free_rooms.append(room)
+                if len(free_rooms) == spread:
+                    break
+        return self.rng.choice(free_rooms) if free_rooms else None
 
     def _optimize_schedule(self):
-        """Optimize the generated schedule"""
-        self._optimize_staff_workload()
-        self._optimize_room_usage()
-        self._optimize_stream_distribution()
+        """Resolve conflicts, then improve the schedule until the budget is spent"""
         self._resolve_conflicts()
-
-    def _optimize_staff_workload(self):
-        """Balance and optimize staff workload distribution"""
-        staff_daily_slots = defaultdict(lambda: defaultdict(list))
-        
-        # Group slots by staff and day
-        for staff_id, schedule in self.resource_manager.staff_schedule.items():
-            for slot in schedule:
-                staff_daily_slots[staff_id][slot.day].append(slot)
-
-        # Optimize each staff's schedule
-        for staff_id, daily_schedule in staff_daily_slots.items():
-            for day, slots in daily_schedule.items():
-                # Sort slots by start time
-                slots.sort(key=lambda x: x.start_time)
-                
-                # Check for excessive gaps
-                self._minimize_staff_gaps(staff_id, day, slots)
-                
-                # Check for excessive consecutive hours
-                self._balance_consecutive_hours(staff_id, day, slots)
-
-    def _minimize_staff_gaps(self, staff_id: int, day: str, slots: List[TimeSlot]):
-        """Minimize gaps in staff's daily schedule"""
-        if len(slots) <= 1:
-            return
-
-        for i in range(len(slots) - 1):
-            gap = datetime.combine(datetime.today(), slots[i+1].start_time) - \
-                  datetime.combine(datetime.today(), slots[i].end_time)
-            
-            if timedelta(minutes=30) < gap < timedelta(hours=2):
-                # Try to reschedule one of the slots
-                self._try_reschedule_slot(staff_id, day, slots[i], slots[i+1])
-
-    def _balance_consecutive_hours(self, staff_id: int, day: str, slots: List[TimeSlot]):
-        """Balance consecutive teaching hours"""
-        consecutive_hours = timedelta()
-        consecutive_slots = []
-
-        for slot in slots:
-            if not consecutive_slots or self._is_consecutive(consecutive_slots[-1], slot):
-                consecutive_slots.append(slot)
-                consecutive_hours += (datetime.combine(datetime.today(), slot.end_time) - 
-                                   datetime.combine(datetime.today(), slot.start_time))
-            else:
-                if consecutive_hours > timedelta(hours=4):
-                    # Try to split consecutive slots
-                    self._split_consecutive_slots(staff_id, consecutive_slots)
-                consecutive_slots = [slot]
-                consecutive_hours = (datetime.combine(datetime.today(), slot.end_time) - 
-                                  datetime.combine(datetime.today(), slot.start_time))
-
-    def _optimize_stream_distribution(self):
-        """Optimize distribution of parallel streams"""
-        # Group allocations by class
-        class_streams = defaultdict(list)
-        for allocation_id, slots in self.stream_allocations.items():
-            allocation = ClassModuleAllocation.objects.get(allocation_id=allocation_id)
-            class_streams[allocation.class_id.Class_id].extend(slots)
-
-        # Process each class's streams
-        for class_id, slots in class_streams.items():
-            self._synchronize_streams(class_id, slots)
-            self._balance_stream_distribution(class_id, slots)
-
-    def _synchronize_streams(self, class_id: int, slots: List[TimeSlot]):
-        """Synchronize parallel streams of the same class"""
-        # Group slots by module
-        module_slots = defaultdict(list)
-        for slot in slots:
-            module_slots[slot.module_id].append(slot)
-
-        # Process each module's slots
-        for module_id, module_slots in module_slots.items():
-            if len(module_slots) > 1:  # Multiple streams
-                self._align_parallel_streams(class_id, module_id, module_slots)
-
-    def _align_parallel_streams(self, class_id: int, module_id: int, slots: List[TimeSlot]):
-        """Align parallel streams to run consecutively"""
-        slots.sort(key=lambda x: x.start_time)
-        target_start_time = slots[0].start_time
-
-        for i, slot in enumerate(slots):
-            if i > 0:
-                desired_start = (datetime.combine(datetime.today(), slots[i-1].end_time) + 
-                               timedelta(minutes=15)).time()
-                if slot.start_time != desired_start:
-                    self._reschedule_stream(slot, desired_start)
-
-    def _reschedule_stream(self, slot: TimeSlot, desired_start_time: datetime.time):
-        """Attempt to reschedule a stream to a desired start time"""
-        duration = datetime.combine(datetime.today(), slot.end_time) - \
-                  datetime.combine(datetime.today(), slot.start_time)
-        desired_end_time = (datetime.combine(datetime.today(), desired_start_time) + 
-                           duration).time()
-        
-        new_slot = TimeSlot(slot.day, desired_start_time, desired_end_time)
-        
-        # Check if new slot is available
-        allocation = self._get_allocation_for_slot(slot)
-        if allocation and self._is_slot_available(allocation, new_slot):
-            self._update_slot_assignment(slot, new_slot, allocation)
-
-    def _optimize_room_usage(self):
-        """Optimize room usage and minimize room changes"""
-        # Group allocations by class and day
-        class_daily_rooms = defaultdict(lambda: defaultdict(list))
-        
-        for allocation_id, slots in self.stream_allocations.items():
-            for slot in slots:
-                allocation = ClassModuleAllocation.objects.get(allocation_id=allocation_id)
-                class_daily_rooms[allocation.class_id.Class_id][slot.day].append(
-                    (slot, self._get_room_for_slot(slot))
-                )
-
-        # Optimize room assignments
-        for class_id, daily_schedule in class_daily_rooms.items():
-            for day, slots_and_rooms in daily_schedule.items():
-                self._optimize_daily_room_usage(class_id, day, slots_and_rooms)
-
-    def _optimize_daily_room_usage(
-        self, 
-        class_id: int, 
-        day: str, 
-        slots_and_rooms: List[Tuple[TimeSlot, Room]]
-    ):
-        """Optimize room usage for a class on a specific day"""
-        slots_and_rooms.sort(key=lambda x: x[0].start_time)
-        
-        # Try to keep consecutive slots in the same room
-        current_room = None
-        consecutive_slots = []
-
-        for slot, room in slots_and_rooms:
-            if not current_room:
-                current_room = room
-                consecutive_slots = [slot]
-            elif room.room_id != current_room.room_id:
-                # Try to move to the previous room if possible
-                if self._can_use_room_for_slots([slot], current_room):
-                    self._update_room_assignment(slot, current_room)
-                else:
-                    # Try to move previous slots to new room
-                    if self._can_use_room_for_slots(consecutive_slots, room):
-                        for prev_slot in consecutive_slots:
-                            self._update_room_assignment(prev_slot, room)
-                        current_room = room
-                    consecutive_slots = [slot]
-            else:
-                consecutive_slots.append(slot)
+        search = LocalSearch(
+            self,
+            self.optimization_budget,
+            rng=self.rng or random.Random(0)
+        )
+        search.run()
 
     def _resolve_conflicts(self):
         """Resolve any remaining scheduling conflicts"""
         conflicts = self._detect_all_conflicts()
         
         while conflicts:
+            self.profiler.conflicts_detected += len(conflicts)
             for conflict in conflicts:
-                if not self._resolve_single_conflict(conflict):
-                    # If can't resolve, add to failed allocations
-                    allocation = self._get_allocation_for_slot(conflict.timetable_id_1)
+                # An earlier move in this pass may already have fixed it
+                if not self._is_live_conflict(conflict):
+                    continue
+                if self._resolve_single_conflict(conflict):
+                    self.profiler.conflicts_resolved += 1
+                else:
+                    # If can't resolve, unschedule and add to failed allocations
+                    allocation = self._unplace(conflict.slot_1)
                     self.failed_allocations.append((SchedulingPriority.HIGH, allocation))
             
-            # Check for remaining conflicts
+            # Only resources touched by this pass are re-checked
             conflicts = self._detect_all_conflicts()
 
-    def _detect_all_conflicts(self) -> List[Conflict]:
-        """Detect all types of conflicts in the current schedule"""
-        conflicts = []
-        
-        # Check staff conflicts
-        staff_conflicts = self._detect_staff_conflicts()
-        conflicts.extend(staff_conflicts)
-        
-        # Check room conflicts
-        room_conflicts = self._detect_room_conflicts()
-        conflicts.extend(room_conflicts)
-        
-        # Check stream conflicts
-        stream_conflicts = self._detect_stream_conflicts()
-        conflicts.extend(stream_conflicts)
-        
-        return conflicts
+    def _detect_all_conflicts(self) -> List[SlotConflict]:
+        """Staff, room and stream conflicts in the current schedule"""
+        return self.conflict_tracker.conflicts()
 
-    def _detect_staff_conflicts(self) -> List[Conflict]:
-        """Detect staff double-booking conflicts"""
-        conflicts = []
-        staff_slots = defaultdict(list)
-        
-        # Group slots by staff
-        for staff_id, schedule in self.resource_manager.staff_schedule.items():
-            for slot in schedule:
-                staff_slots[staff_id].append(slot)
-        
-        # Check for overlaps
-        for staff_id, slots in staff_slots.items():
-            for i, slot1 in enumerate(slots):
-                for slot2 in slots[i+1:]:
-                    if slot1.overlaps(slot2):
-                        conflicts.append(
-                            Conflict(
-                                timetable_id_1=self._get_timetable_entry(slot1),
-                                timetable_id_2=self._get_timetable_entry(slot2),
-                                conflict_type='staff',
-                                conflict_description=f"staff {staff_id} double-booked"
-                            )
-                        )
-        
-        return conflicts
+    def _is_live_conflict(self, conflict: SlotConflict) -> bool:
+        return (
+            conflict.slot_1 in self.slot_allocations and
+            conflict.slot_2 in self.slot_allocations
+        )
 
-    def _resolve_single_conflict(self, conflict: Conflict) -> bool:
+    def _resolve_single_conflict(self, conflict: SlotConflict) -> bool:
         """Attempt to resolve a single conflict"""
         if conflict.conflict_type == 'staff':
             return self._resolve_staff_conflict(conflict)
@@ -450,26 +587,30 @@ class TimetableGenerator:
             return self._resolve_stream_conflict(conflict)
         return False
 
-    def _resolve_staff_conflict(self, conflict: Conflict) -> bool:
+    def _resolve_staff_conflict(self, conflict: SlotConflict) -> bool:
         """Resolve a staff conflict by rescheduling one of the slots"""
-        slot1 = self._get_slot_from_timetable(conflict.timetable_id_1)
-        slot2 = self._get_slot_from_timetable(conflict.timetable_id_2)
-        
-        # Try to reschedule slot1
-        allocation1 = self._get_allocation_for_slot(slot1)
-        alternative_slots = self._find_possible_slots(allocation1)
-        
-        for alt_slot in alternative_slots:
-            if self._try_reschedule_slot_to(slot1, alt_slot):
-                return True
-        
-        # If slot1 couldn't be rescheduled, try slot2
-        allocation2 = self._get_allocation_for_slot(slot2)
-        alternative_slots = self._find_possible_slots(allocation2)
-        
-        for alt_slot in alternative_slots:
-            if self._try_reschedule_slot_to(slot2, alt_slot):
+        return self._reschedule_either(conflict.slot_1, conflict.slot_2)
+
+    def _resolve_room_conflict(self, conflict: SlotConflict) -> bool:
+        """Resolve a room conflict by changing room, then by rescheduling"""
+        for slot in (conflict.slot_1, conflict.slot_2):
+            if self._try_reschedule_slot_to(slot, slot):
                 return True
+        return self._reschedule_either(conflict.slot_1, conflict.slot_2)
+
+    def _resolve_stream_conflict(self, conflict: SlotConflict) -> bool:
+        """Resolve a class stream clash by rescheduling one of the slots"""
+        return self._reschedule_either(conflict.slot_1, conflict.slot_2)
+
+    def _reschedule_either(self, slot1: TimeSlot, slot2: TimeSlot) -> bool:
+        """Move slot1 to a free alternative, falling back to slot2"""
+        for slot in (slot1, slot2):
+            allocation = self._get_allocation_for_slot(slot)
+            if allocation is None:
+                continue
+            for alt_slot in self._find_possible_slots(allocation):
+                if self._try_reschedule_slot_to(slot, alt_slot):
+                    return True
         
         return False
 
@@ -482,7 +623,7 @@ class TimetableGenerator:
             failed = []
             
             # Sort failed allocations by priority
-            self.failed_allocations.sort(reverse=True)
+            self.failed_allocations.sort(key=lambda item: item[0], reverse=True)
             
             for priority, allocation in self.failed_allocations:
                 # Try with relaxed constraints
@@ -495,7 +636,7 @@ class TimetableGenerator:
             self.failed_allocations = failed
             retry_count += 1
 
-    def _try_schedule_with_relaxed_constraints(self, allocation: ClassModuleAllocation) -> bool:
+    def _try_schedule_with_relaxed_constraints(self, allocation: AllocationRecord) -> bool:
         """Attempt to schedule with relaxed constraints"""
         # Try different strategies with increasingly relaxed constraints
         strategies = [
@@ -511,6 +652,97 @@ class TimetableGenerator:
         
         return False
 
+    def _try_different_room_type(self, allocation: AllocationRecord) -> bool:
+        """Place a non-laboratory module in a free room of another type"""
+        if allocation.module_id.module_type == 'Laboratory':
+            return False
+        room_types = [
+            room_type for room_type in self.room_catalogue.rooms_by_type
+            if room_type not in (allocation.module_id.module_type, 'Laboratory')
+        ]
+        sessions = self.slot_grid.sessions(
+            allocation.program_id.program_name, self._calculate_duration(allocation)
+        )
+        return self._place_in_sessions(allocation, sessions, room_types) is not None
+
+    def _try_split_session(self, allocation: AllocationRecord) -> bool:
+        """Teach the session as two halves on different days"""
+        duration = self.slot_grid.duration_minutes(self._calculate_duration(allocation))
+        unit = TimetableConstraints.SLOT_MINUTES
+        first_half = -(-duration // 2 // unit) * unit
+        halves = (first_half, duration - first_half)
+        room_types = [allocation.module_id.module_type]
+
+        program_name = allocation.program_id.program_name
+        first = self._place_in_sessions(
+            allocation, self.slot_grid.sessions(program_name, halves[0]), room_types
+        )
+        if first is None:
+            return False
+        second = self._place_in_sessions(
+            allocation, self.slot_grid.sessions(program_name, halves[1]), room_types,
+            skip_day=first.day_index
+        )
+        if second is None:
+            self._unplace(first)
+            return False
+        return True
+
+    def _try_different_day(self, allocation: AllocationRecord) -> bool:
+        """Retry on the class's least busy days first, now that moves freed time"""
+        sessions_per_day = defaultdict(int)
+        for slot in self.resource_manager.class_schedule.get(allocation.class_id.Class_id, []):
+            sessions_per_day[slot.day_index] += 1
+        possible_slots = sorted(
+            self._find_possible_slots(allocation),
+            key=lambda slot: sessions_per_day[slot.day_index]
+        )
+        for slot in possible_slots:
+            room = self._find_available_room(allocation, slot)
+            if room is not None:
+                self._place(allocation, slot, room)
+                return True
+        return False
+
+    def _try_edge_hours(self, allocation: AllocationRecord) -> bool:
+        """Use the whole teaching day instead of the program's window"""
+        sessions = self.slot_grid.day_sessions(self._calculate_duration(allocation))
+        return self._place_in_sessions(
+            allocation, sessions, [allocation.module_id.module_type]
+        ) is not None
+
+    def _place_in_sessions(
+        self,
+        allocation: AllocationRecord,
+        sessions: List[Tuple[int, int]],
+        room_types: List[str],
+        skip_day: Optional[int] = None
+    ) -> Optional[TimeSlot]:
+        """Place an allocation in the first free session with a room of the given types"""
+        staff_id = allocation.staff_id.staff_id
+        class_id = allocation.class_id.Class_id
+        capacity = allocation.class_id.class_capacity
+        is_room_available = self.resource_manager.is_room_available
+
+        for day_index in range(len(TimetableConstraints.DAYS)):
+            if day_index == skip_day:
+                continue
+            for start, end in sessions:
+                slot = TimeSlot.from_minutes(day_index, start, end)
+                if not (
+                    self.resource_manager.is_staff_available(staff_id, slot) and
+                    self.resource_manager.is_class_available(class_id, slot)
+                ):
+                    continue
+                for room_type in room_types:
+                    room = self.room_catalogue.find_free(
+                        room_type, capacity, lambda room_id: is_room_available(room_id, slot)
+                    )
+                    if room is not None:
+                        self._place(allocation, slot, room)
+                        return slot
+        return None
+
     def _validate_final_schedule(self) -> bool:
         """Validate the final schedule"""
         # Check for basic constraints
@@ -534,7 +766,7 @@ class TimetableGenerator:
     def _validate_basic_constraints(self) -> bool:
         """Validate basic scheduling constraints"""
         for allocation_id, slots in self.stream_allocations.items():
-            allocation = ClassModuleAllocation.objects.get(allocation_id=allocation_id)
+            allocation = self.allocations[allocation_id]
             
             # Check number of periods
             if not self._validate_period_count(allocation, slots):
@@ -550,27 +782,64 @@ class TimetableGenerator:
         
         return True
 
+    def _validate_period_count(self, allocation: AllocationRecord, slots: List[TimeSlot]) -> bool:
+        """Sessions of an allocation add up to its credit-based duration"""
+        taught = sum(slot.end_minute - slot.start_minute for slot in slots)
+        return taught == self.slot_grid.duration_minutes(self._calculate_duration(allocation))
+
+    def _validate_time_constraints(self, allocation: AllocationRecord, slots: List[TimeSlot]) -> bool:
+        """Every session lies within the teaching day"""
+        day_start, day_end = self.slot_grid.window(None)
+        return all(
+            day_start <= slot.start_minute < slot.end_minute <= day_end
+            for slot in slots
+        )
+
+    def _validate_break_times(self, slots: List[TimeSlot]) -> bool:
+        """No session starts inside a break, the rule the slot grid compiles in"""
+        return all(self.slot_grid.break_at(slot.start_minute) is None for slot in slots)
+
+    def _validate_staff_workload(self) -> bool:
+        """No staff member teaches two sessions at once"""
+        return not self.resource_manager.clashing_staff()
+
+    def _validate_stream_distribution(self) -> bool:
+        """No class stream attends two sessions at once"""
+        return not self.resource_manager.clashing_classes()
+
+    def _validate_room_utilization(self) -> bool:
+        """No room is double booked and every room holds its class"""
+        if self.resource_manager.clashing_rooms():
+            return False
+        return all(
+            self.slot_rooms[slot].capacity >= allocation.class_id.class_capacity
+            for slot, allocation in self.slot_allocations.items()
+        )
+
     def _save_timetable(self):
-        """Save the generated timetable to the database"""
+        """Save the generated timetable as a new version and publish it"""
+        # Readers keep being served the active version while this one is
+        # written; publishing only flips the active flag
         with transaction.atomic():
-            # Clear existing timetable entries
-            Timetable.objects.all().delete()
+            version = TimetableVersion.objects.create()
             
             # Save new timetable entries
             timetable_entries = []
             
             for allocation_id, slots in self.stream_allocations.items():
-                allocation = ClassModuleAllocation.objects.get(allocation_id=allocation_id)
+                allocation = self.allocations[allocation_id]
                 
                 for slot in slots:
                     room = self._get_room_for_slot(slot)
                     
                     timetable_entries.append(
                         Timetable(
-                            module_id=allocation.module_id,
-                            room_id=room,
-                            staff_id=allocation.staff_id,
-                            class_id=allocation.class_id,
+                            version=version,
+                            allocation_id=allocation_id,
+                            module_id_id=allocation.module_id.module_id,
+                            room_id_id=room.room_id,
+                            staff_id_id=allocation.staff_id.staff_id,
+                            class_id_id=allocation.class_id.Class_id,
                             class_stream=allocation.class_id.class_stream,
                             day_of_week=slot.day,
                             start_time=slot.start_time,
@@ -580,4 +849,8 @@ class TimetableGenerator:
                     )
             
             # Bulk create timetable entries
-            Timetable.objects.bulk_create(timetable_entries)
+            Timetable.objects.bulk_create(timetable_entries, batch_size=1000)
+
+        if self.publish:
+            version.publish()
+        self.version = version
@@ -0,0 +1,168 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .slotgrid import to_minutes
+
+# (day, start minute, end minute, weight) of one teacher preference
+Preference = Tuple[str, int, int, int]
+
+
+class _Record:
+    """Plain slotted row; attribute names follow the model fields they mirror"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(str(getattr(self, name)) for name in self.__slots__)})"
+
+
+class ProgramRecord(_Record):
+    __slots__ = ('index', 'program_id', 'program_name', 'nta_level', 'dept_id')
+
+
+class ModuleRecord(_Record):
+    __slots__ = ('index', 'module_id', 'module_type', 'module_credit', 'semester')
+
+
+class RoomRecord(_Record):
+    __slots__ = ('index', 'room_id', 'room_type', 'capacity')
+
+
+class StaffRecord(_Record):
+    __slots__ = ('index', 'staff_id', 'dept_id')
+
+
+class ClassRecord(_Record):
+    __slots__ = ('index', 'Class_id', 'class_capacity', 'class_stream', 'academic_year', 'program_id')
+
+
+class AllocationRecord(_Record):
+    """One class/module/staff allocation with its related records joined.
+
+    ``class_id``, ``module_id``, ``staff_id`` and ``program_id`` hold the
+    related records, the same way the ORM foreign keys hold instances.
+    """
+    __slots__ = ('index', 'allocation_id', 'class_id', 'module_id', 'staff_id', 'program_id')
+
+
+class ProblemInstance:
+    """Everything a solver reads, loaded up front in a fixed number of queries.
+
+    Rows are kept as slotted records in lists indexed by a dense index;
+    ``*_index`` maps database ids to those indices. Solvers never touch the
+    ORM, so an instance can be built once and shipped to worker processes.
+    """
+
+    def __init__(
+        self,
+        programs: List[ProgramRecord],
+        modules: List[ModuleRecord],
+        rooms: List[RoomRecord],
+        staff: List[StaffRecord],
+        classes: List[ClassRecord],
+        allocations: List[AllocationRecord],
+        preferences: List[List[Preference]]
+    ):
+        self.programs = programs
+        self.modules = modules
+        self.rooms = rooms
+        self.staff = staff
+        self.classes = classes
+        self.allocations = allocations
+        # Per staff index, sorted by day and start
+        self.preferences = preferences
+
+        self.program_index = {record.program_id: record.index for record in programs}
+        self.module_index = {record.module_id: record.index for record in modules}
+        self.room_index = {record.room_id: record.index for record in rooms}
+        self.staff_index = {record.staff_id: record.index for record in staff}
+        self.class_index = {record.Class_id: record.index for record in classes}
+        self.allocation_index = {record.allocation_id: record.index for record in allocations}
+
+    @classmethod
+    def load(
+        cls,
+        academic_year: Optional[str] = None,
+        semester: Optional[int] = None
+    ) -> 'ProblemInstance':
+        """Load the instance, optionally only allocations of one term"""
+        from .models import (
+            Class, ClassModuleAllocation, Module, Program, Room, Staff, TeacherPreference
+        )
+
+        programs = [
+            ProgramRecord(index, *row) for index, row in enumerate(
+                Program.objects.order_by('program_id').values_list(
+                    'program_id', 'program_name', 'nta_level', 'dept_id'
+                )
+            )
+        ]
+        program_index = {record.program_id: record.index for record in programs}
+
+        modules = [
+            ModuleRecord(index, *row) for index, row in enumerate(
+                Module.objects.order_by('module_id').values_list(
+                    'module_id', 'module_type', 'module_credit', 'semester'
+                )
+            )
+        ]
+        rooms = [
+            RoomRecord(index, *row) for index, row in enumerate(
+                Room.objects.order_by('room_id').values_list('room_id', 'room_type', 'capacity')
+            )
+        ]
+        staff = [
+            StaffRecord(index, *row) for index, row in enumerate(
+                Staff.objects.order_by('staff_id').values_list('staff_id', 'dept_id')
+            )
+        ]
+        classes = [
+            ClassRecord(index, class_id, capacity, stream, year, programs[program_index[program_id]])
+            for index, (class_id, capacity, stream, year, program_id) in enumerate(
+                Class.objects.order_by('Class_id').values_list(
+                    'Class_id', 'class_capacity', 'class_stream', 'academic_year', 'program_id'
+                )
+            )
+        ]
+
+        module_index = {record.module_id: record.index for record in modules}
+        staff_index = {record.staff_id: record.index for record in staff}
+        class_index = {record.Class_id: record.index for record in classes}
+
+        rows = ClassModuleAllocation.objects.order_by('allocation_id')
+        if academic_year is not None:
+            rows = rows.filter(class_id__academic_year=academic_year)
+        if semester is not None:
+            rows = rows.filter(module_id__semester=semester)
+        allocations = [
+            AllocationRecord(
+                index, allocation_id,
+                classes[class_index[class_id]],
+                modules[module_index[module_id]],
+                staff[staff_index[staff_id]],
+                programs[program_index[program_id]]
+            )
+            for index, (allocation_id, class_id, module_id, staff_id, program_id) in enumerate(
+                rows.values_list('allocation_id', 'class_id', 'module_id', 'staff_id', 'program_id')
+            )
+        ]
+
+        preferences: Dict[int, List[Preference]] = defaultdict(list)
+        for staff_id, day, start, end, weight in TeacherPreference.objects.values_list(
+            'staff_id', 'day_of_week', 'start_time', 'end_time', 'preference_weight'
+        ):
+            preferences[staff_index[staff_id]].append((day, to_minutes(start), to_minutes(end), weight))
+
+        return cls(
+            programs, modules, rooms, staff, classes, allocations,
+            [sorted(preferences.get(index, [])) for index in range(len(staff))]
+        )
+
+    def allocation(self, allocation_id: int) -> AllocationRecord:
+        return self.allocations[self.allocation_index[allocation_id]]
+
+    def room(self, room_id: int) -> RoomRecord:
+        return self.rooms[self.room_index[room_id]]
@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .generator import TimetableGenerator
+from .models import GenerationJob, TimetableVersion
+from .repair import ChangeSet, IncrementalTimetableGenerator
+
+
+def default_parameters() -> Dict:
+    """Generation parameters taken from settings"""
+    return {
+        'workers': getattr(settings, 'TIMETABLE_GENERATION_WORKERS', 1),
+        'starts': getattr(settings, 'TIMETABLE_GENERATION_STARTS', 1),
+        'optimization_budget': getattr(settings, 'TIMETABLE_OPTIMIZATION_SECONDS', None),
+        'publish': True,
+        'use_cache': getattr(settings, 'TIMETABLE_RESULT_CACHE', False),
+        'trace_memory': getattr(settings, 'TIMETABLE_TRACE_MEMORY', False),
+    }
+
+
+def start_generation_job(parameters: Optional[Dict] = None, user=None) -> GenerationJob:
+    """Record a queued generation job and hand it to the configured backend"""
+    job_parameters = default_parameters()
+    job_parameters.update(parameters or {})
+    job = GenerationJob.objects.create(
+        parameters=job_parameters,
+        requested_by=user if user is not None and user.is_authenticated else None
+    )
+
+    backend = getattr(settings, 'TIMETABLE_JOB_BACKEND', 'celery')
+    try:
+        if backend == 'thread':
+            threading.Thread(
+                target=_run_in_thread, args=(job.job_id,), daemon=True
+            ).start()
+        else:
+            from .tasks import run_generation_job_task
+            run_generation_job_task.delay(job.job_id)
+    except Exception as e:
+        # An unreachable broker would otherwise leave the job queued forever
+        GenerationJob.objects.filter(job_id=job.job_id).update(
+            status='failed', error=f"Could not queue job: {e}", finished_at=timezone.now()
+        )
+        raise
+    return job
+
+
+def start_repair_job(
+    change_set: ChangeSet,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = None,
+    user=None
+) -> GenerationJob:
+    """Queue a repair of the active version for a change set"""
+    return start_generation_job({
+        'change_set': change_set.to_dict(),
+        'academic_year': academic_year,
+        'semester': semester,
+    }, user=user)
+
+
+def run_generation_job(job_id: int):
+    """Run a queued job, recording its phase, progress, timing and outcome"""
+    jobs = GenerationJob.objects.filter(job_id=job_id)
+    job = jobs.get()
+    jobs.update(status='running', started_at=timezone.now(), phase=None, progress=0)
+
+    def on_progress(phase: str, progress: float):
+        jobs.update(phase=phase, progress=progress)
+
+    parameters = job.parameters
+    generator = None
+    result = {}
+    try:
+        if parameters.get('change_set') is not None:
+            # Repair jobs edit the active version in place
+            generator = IncrementalTimetableGenerator(
+                academic_year=parameters.get('academic_year'),
+                semester=parameters.get('semester'),
+                on_progress=on_progress,
+                trace_memory=parameters.get('trace_memory', False)
+            )
+            result = generator.repair(ChangeSet.from_dict(parameters['change_set']))
+        else:
+            generator = TimetableGenerator(
+                optimization_budget=parameters.get('optimization_budget'),
+                seed=parameters.get('seed'),
+                on_progress=on_progress,
+                publish=parameters.get('publish', True),
+                use_cache=parameters.get('use_cache', False),
+                trace_memory=parameters.get('trace_memory', False)
+            )
+            generator.generate_timetable(
+                workers=parameters.get('workers'),
+                starts=parameters.get('starts')
+            )
+    except Exception as e:
+        jobs.update(
+            status='failed', error=str(e), finished_at=timezone.now(),
+            profile=generator.profiler.report() if generator else {}
+        )
+        return
+
+    jobs.update(
+        status='done', progress=1.0, version=generator.version, result=result,
+        profile=generator.profiler.report(), finished_at=timezone.now()
+    )
+    TimetableVersion.prune(getattr(settings, 'TIMETABLE_VERSIONS_KEPT', 5))
+
+
+def _run_in_thread(job_id: int):
+    try:
+        run_generation_job(job_id)
+    finally:
+        close_old_connections()
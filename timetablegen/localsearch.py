@@ -0,0 +1,246 @@
+import math
+import random
+import time as clock
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .constraints import TimetableConstraints
+from .scoring import day_penalty
+
+# (kind, resource_id, day) bucket whose day penalty is cached
+Bucket = Tuple[str, int, str]
+
+
+class LocalSearch:
+    """Time-budgeted simulated annealing over a generator's placements.
+
+    Neighbourhoods move one session to another legal time, swap the times
+    of two sessions of equal length, or move a session to another free
+    room. Every step keeps the schedule free of hard conflicts; only the
+    staff and class days it touches are re-scored, and the best schedule
+    seen is restored when the budget runs out. Recently moved allocations
+    are tabu for a few iterations to stop the search cycling.
+    """
+
+    def __init__(
+        self,
+        generator,
+        time_budget: float,
+        rng: Optional[random.Random] = None,
+        initial_temperature: float = 60.0,
+        cooling: float = 0.999,
+        tabu_tenure: int = 10
+    ):
+        self.generator = generator
+        self.time_budget = time_budget
+        self.rng = rng or random.Random(0)
+        self.temperature = initial_temperature
+        self.cooling = cooling
+        self.tabu: deque = deque(maxlen=tabu_tenure)
+
+        self._costs: Dict[Bucket, int] = {}
+        self.penalty = 0
+        self.iterations = 0
+
+    def run(self) -> int:
+        """Search until the budget is spent or the penalty is zero, returning the best penalty"""
+        generator = self.generator
+        deadline = clock.monotonic() + self.time_budget
+        self._score_all()
+
+        best_penalty = self.penalty
+        best = None
+        moves = (self._try_move, self._try_swap, self._try_room_move)
+
+        # With no more placed allocations than the tenure, every pick
+        # could be tabu; keep at least one allocation free to move
+        placed = len(generator.stream_allocations)
+        if placed <= self.tabu.maxlen:
+            self.tabu = deque(self.tabu, maxlen=max(placed - 1, 0))
+
+        # Kept current by the generator's _place and _unplace
+        slots = generator.placed_slots
+        while clock.monotonic() < deadline:
+            # Penalties are never negative, so nothing beats zero
+            if not slots or self.penalty == 0:
+                break
+            self.iterations += 1
+            slot = self.rng.choice(slots)
+            if generator.slot_allocations[slot].allocation_id in self.tabu:
+                continue
+
+            self.rng.choice(moves)(slot, slots)
+            self.temperature *= self.cooling
+
+            if self.penalty < best_penalty:
+                best_penalty = self.penalty
+                best = generator.export_placements()
+
+        if best is not None and self.penalty > best_penalty:
+            self._restore(best)
+        return min(best_penalty, self.penalty)
+
+    def _try_move(self, slot, slots):
+        """Move a session to another legal time with a free room"""
+        generator = self.generator
+        allocation = generator.slot_allocations[slot]
+        sessions = generator._feasible_sessions(allocation)
+        if not sessions:
+            return
+        day = self.rng.choice(TimetableConstraints.DAYS)
+        start, end = self.rng.choice(sessions)
+        if day == slot.day and start == slot.start_minute:
+            return
+
+        room = generator.slot_rooms[slot]
+        generator._unplace(slot)
+        new_slot = generator._make_slot(day, start, end)
+        new_room = self._free_room(allocation, new_slot)
+        if new_room is None:
+            generator._place(allocation, slot, room)
+            return
+
+        generator._place(allocation, new_slot, new_room)
+        if not self._accept(allocation, (slot.day, day)):
+            generator._unplace(new_slot)
+            generator._place(allocation, slot, room)
+            self._rescore(allocation, (slot.day, day))
+
+    def _try_swap(self, slot, slots):
+        """Exchange the times of two sessions of the same length"""
+        generator = self.generator
+        other = self.rng.choice(slots)
+        length = slot.end_minute - slot.start_minute
+        if other is slot or other.end_minute - other.start_minute != length:
+            return
+        if other.day == slot.day and other.start_minute == slot.start_minute:
+            return
+
+        first = generator.slot_allocations[slot]
+        second = generator.slot_allocations[other]
+        if second.allocation_id in self.tabu:
+            return
+        # Each session must be allowed at the other's time, as in _try_move
+        if (other.start_minute, other.end_minute) not in generator._feasible_sessions(first):
+            return
+        if (slot.start_minute, slot.end_minute) not in generator._feasible_sessions(second):
+            return
+        first_room = generator.slot_rooms[slot]
+        second_room = generator.slot_rooms[other]
+
+        generator._unplace(slot)
+        generator._unplace(other)
+        first_slot = generator._make_slot(other.day, other.start_minute, other.end_minute)
+        second_slot = generator._make_slot(slot.day, slot.start_minute, slot.end_minute)
+
+        placed = []
+        for allocation, new_slot in ((first, first_slot), (second, second_slot)):
+            room = self._free_room(allocation, new_slot)
+            if room is None:
+                break
+            generator._place(allocation, new_slot, room)
+            placed.append(new_slot)
+
+        days = (slot.day, other.day)
+        if len(placed) == 2 and self._accept((first, second), days):
+            return
+
+        for new_slot in placed:
+            generator._unplace(new_slot)
+        generator._place(first, slot, first_room)
+        generator._place(second, other, second_room)
+        if len(placed) == 2:
+            self._rescore((first, second), days)
+
+    def _try_room_move(self, slot, slots):
+        """Move a session to another free room of the right type and size"""
+        generator = self.generator
+        allocation = generator.slot_allocations[slot]
+        room = generator.slot_rooms[slot]
+        candidates = [
+            candidate for candidate in generator.room_catalogue.candidates(
+                allocation.module_id.module_type,
+                allocation.class_id.class_capacity
+            )
+            if candidate.room_id != room.room_id and
+            generator.resource_manager.is_room_available(candidate.room_id, slot)
+        ]
+        if not candidates:
+            return
+
+        generator._unplace(slot)
+        generator._place(allocation, slot, self.rng.choice(candidates))
+        if not self._accept(allocation, (slot.day,)):
+            generator._unplace(slot)
+            generator._place(allocation, slot, room)
+            self._rescore(allocation, (slot.day,))
+
+    def _free_room(self, allocation, slot):
+        manager = self.generator.resource_manager
+        if not manager.is_staff_available(allocation.staff_id.staff_id, slot):
+            return None
+        if not manager.is_class_available(allocation.class_id.Class_id, slot):
+            return None
+        return self.generator._find_available_room(allocation, slot)
+
+    def _accept(self, allocations, days) -> bool:
+        """Re-score the touched buckets and apply the annealing criterion"""
+        delta = self._rescore(allocations, days)
+        if delta <= 0 or self.rng.random() < math.exp(-delta / max(self.temperature, 1e-6)):
+            self._mark_tabu(allocations)
+            return True
+        return False
+
+    def _rescore(self, allocations, days) -> int:
+        if not isinstance(allocations, tuple):
+            allocations = (allocations,)
+        delta = 0
+        for bucket in self._buckets(allocations, days):
+            cost = self._bucket_cost(bucket)
+            delta += cost - self._costs.get(bucket, 0)
+            self._costs[bucket] = cost
+        self.penalty += delta
+        return delta
+
+    def _mark_tabu(self, allocations):
+        if not isinstance(allocations, tuple):
+            allocations = (allocations,)
+        for allocation in allocations:
+            self.tabu.append(allocation.allocation_id)
+
+    def _buckets(self, allocations, days) -> List[Bucket]:
+        buckets = set()
+        for allocation in allocations:
+            for day in days:
+                buckets.add(('staff', allocation.staff_id.staff_id, day))
+                buckets.add(('class', allocation.class_id.Class_id, day))
+        return list(buckets)
+
+    def _bucket_cost(self, bucket: Bucket) -> int:
+        kind, resource_id, day = bucket
+        manager = self.generator.resource_manager
+        schedule = (
+            manager.staff_schedule if kind == 'staff' else manager.class_schedule
+        ).get(resource_id, [])
+        rooms = self.generator.slot_rooms
+        return day_penalty([
+            (slot.start_minute, slot.end_minute, rooms[slot].room_id)
+            for slot in schedule if slot.day == day
+        ])
+
+    def _score_all(self):
+        manager = self.generator.resource_manager
+        self._costs = {}
+        for kind, schedules in (('staff', manager.staff_schedule), ('class', manager.class_schedule)):
+            for resource_id, schedule in schedules.items():
+                for day in {slot.day for slot in schedule}:
+                    bucket = (kind, resource_id, day)
+                    self._costs[bucket] = self._bucket_cost(bucket)
+        self.penalty = sum(self._costs.values())
+
+    def _restore(self, placements):
+        generator = self.generator
+        for slot in list(generator.slot_allocations):
+            generator._unplace(slot)
+        generator._import_placements(placements)
+        self._score_all()
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from timetablegen.benchmark import SIZES, compare_to_baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the timetable generators on seeded synthetic institutions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=SIZES, default=list(SIZES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--budget', type=float, default=2.0,
+                            help='Local search budget in seconds for the greedy generator')
+        parser.add_argument('--generators', nargs='+', choices=('greedy', 'backtrack'),
+                            default=['greedy', 'backtrack'])
+        parser.add_argument('--output', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'),
+                            help='Where to write the results')
+        parser.add_argument('--compare', action='store_true',
+                            help='Compare against the existing file instead of overwriting it')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative runtime growth when comparing')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+
+        # Synthetic rows never touch the configured database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            current = run_benchmarks(
+                options['sizes'], options['seed'], options['budget'], options['generators']
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for result in current['results']:
+            for run in result['runs']:
+                line = (
+                    f"{result['size']:>6} {run['generator']:>9}: {run['runtime']}s, "
+                    f"{run['queries']} queries, {run['peak_memory_kb']} KB"
+                )
+                if 'error' in run:
+                    line += f", error: {run['error']}"
+                else:
+                    line += f", {run.get('unscheduled', 0)} unscheduled"
+                self.stdout.write(line)
+
+        if options['compare']:
+            if not output.exists():
+                raise CommandError(f"No baseline at {output}")
+            regressions = compare_to_baseline(
+                current, json.loads(output.read_text()), options['tolerance']
+            )
+            if regressions:
+                raise CommandError('Regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+            return
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Baseline written to {output}"))
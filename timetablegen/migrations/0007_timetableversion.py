@@ -0,0 +1,58 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def assign_existing_entries(apps, schema_editor):
+    Timetable = apps.get_model('timetablegen', 'Timetable')
+    TimetableVersion = apps.get_model('timetablegen', 'TimetableVersion')
+    if not Timetable.objects.exists():
+        return
+    version = TimetableVersion.objects.create(
+        label='Initial', is_active=True, published_at=timezone.now()
+    )
+    Timetable.objects.update(version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetablegen', '0006_generationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('version_id', models.AutoField(primary_key=True, serialize=False)),
+                ('label', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timetableversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_timetable_version'),
+        ),
+        migrations.AddField(
+            model_name='timetable',
+            name='version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='timetablegen.timetableversion'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetable',
+            unique_together={('version', 'class_id', 'class_stream', 'day_of_week', 'start_time'), ('version', 'room_id', 'day_of_week', 'start_time'), ('version', 'staff_id', 'day_of_week', 'start_time')},
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to='timetablegen.timetableversion'),
+        ),
+        migrations.RunPython(assign_existing_entries, migrations.RunPython.noop),
+    ]
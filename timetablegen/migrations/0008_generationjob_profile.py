@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetablegen', '0007_timetableversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
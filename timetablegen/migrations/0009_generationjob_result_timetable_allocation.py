@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetablegen', '0008_generationjob_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='timetable',
+            name='allocation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timetable_entries', to='timetablegen.classmoduleallocation'),
+        ),
+    ]
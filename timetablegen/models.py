@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Department(models.Model):
@@ -61,8 +62,58 @@ class Staff(models.Model):
     def __str__(self):
         return f"{self.staff_name} ({self.staff_title})"
 
+class TimetableVersion(models.Model):
+    version_id = models.AutoField(primary_key=True)
+    label = models.CharField(max_length=255, blank=True, null=True)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='single_active_timetable_version'
+            )
+        ]
+
+    def __str__(self):
+        return self.label or f"Version {self.version_id}"
+
+    def publish(self):
+        """Make this the version every read endpoint serves"""
+        with transaction.atomic():
+            TimetableVersion.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+            self.is_active = True
+            self.published_at = timezone.now()
+            self.save(update_fields=['is_active', 'published_at'])
+
+    @classmethod
+    def active(cls):
+        return cls.objects.filter(is_active=True).first()
+
+    @classmethod
+    def prune(cls, keep: int) -> int:
+        """Delete inactive versions beyond the ``keep`` most recent ones"""
+        stale = list(
+            cls.objects.filter(is_active=False)
+            .order_by('-created_at')
+            .values_list('version_id', flat=True)[keep:]
+        )
+        cls.objects.filter(version_id__in=stale).delete()
+        return len(stale)
+
+class TimetableQuerySet(models.QuerySet):
+    def active(self):
+        """Entries of the published version"""
+        return self.filter(version__is_active=True)
+
 class Timetable(models.Model):
     timetable_id = models.AutoField(primary_key=True)
+    version = models.ForeignKey(TimetableVersion, on_delete=models.CASCADE, related_name='entries', null=True, blank=True)
+    allocation = models.ForeignKey('ClassModuleAllocation', on_delete=models.SET_NULL, related_name='timetable_entries', null=True, blank=True)
     module_id = models.ForeignKey('Module', on_delete=models.CASCADE, related_name='timetable_entries')
     room_id = models.ForeignKey('Room', on_delete=models.CASCADE, related_name='timetable_entries')
     staff_id = models.ForeignKey('Staff', on_delete=models.CASCADE, related_name='timetable_entries')
@@ -73,14 +124,16 @@ class Timetable(models.Model):
     end_time = models.TimeField()
     semester = models.IntegerField()
 
+    objects = TimetableQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.module_id} - {self.class_id.Class_name} Stream {self.class_stream} ({self.day_of_week} {self.start_time}-{self.end_time})"
 
     class Meta:
         unique_together = [
-            ['staff_id', 'day_of_week', 'start_time'],
-            ['room_id', 'day_of_week', 'start_time'],
-            ['class_id', 'class_stream', 'day_of_week', 'start_time']
+            ['version', 'staff_id', 'day_of_week', 'start_time'],
+            ['version', 'room_id', 'day_of_week', 'start_time'],
+            ['version', 'class_id', 'class_stream', 'day_of_week', 'start_time']
         ]
 
 class TeacherPreference(models.Model):
@@ -154,4 +207,32 @@ class ClassModuleAllocation(models.Model):
         verbose_name_plural = 'Class Module Allocations'
 
     def __str__(self):
-        return f"Class: {self.class_id} | Module: {self.module_id} | Teacher: {self.staff_id}"
\ No newline at end of file
+        return f"Class: {self.class_id} | Module: {self.module_id} | Teacher: {self.staff_id}"
+
+class GenerationJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.AutoField(primary_key=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    phase = models.CharField(max_length=50, blank=True, null=True)
+    progress = models.FloatField(default=0)
+    parameters = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    profile = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='generation_jobs', null=True, blank=True)
+    version = models.ForeignKey(TimetableVersion, on_delete=models.SET_NULL, related_name='generation_jobs', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Generation job {self.job_id} ({self.status})"
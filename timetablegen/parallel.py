@@ -0,0 +1,130 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .instance import ProblemInstance
+from .scoring import ScheduleScore
+from .solution import SolutionStore
+
+
+def init_worker():
+    """Make sure Django is configured in pool processes started with spawn"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+# Set by init_portfolio_worker once another search of a portfolio has finished
+_stop_event = None
+
+
+def init_portfolio_worker(stop_event):
+    """Configure Django and keep the portfolio's shared stop event"""
+    global _stop_event
+    init_worker()
+    _stop_event = stop_event
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent: Dict = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        while parent != self.parent[parent]:
+            self.parent[parent] = self.parent[self.parent[parent]]
+            parent = self.parent[parent]
+        self.parent[item] = parent
+        return parent
+
+    def union(self, first, second):
+        root_first, root_second = self.find(first), self.find(second)
+        if root_first != root_second:
+            self.parent[root_second] = root_first
+
+
+def partition_allocations(allocations: Iterable, max_partitions: int) -> List[List]:
+    """Split allocations into groups that share no staff member or class.
+
+    Allocations teaching the same class or taught by the same staff member
+    always land in the same group, so groups can be solved independently;
+    only rooms may still clash once results are merged. Connected
+    components are packed largest-first into at most ``max_partitions``
+    groups of similar size.
+    """
+    allocations = list(allocations)
+    components = _DisjointSet()
+    for allocation in allocations:
+        node = ('allocation', allocation.allocation_id)
+        components.union(node, ('staff', allocation.staff_id.staff_id))
+        components.union(node, ('class', allocation.class_id.Class_id))
+
+    grouped: Dict = {}
+    for allocation in allocations:
+        root = components.find(('allocation', allocation.allocation_id))
+        grouped.setdefault(root, []).append(allocation)
+
+    bins: List[List] = [[] for _ in range(max(1, min(max_partitions, len(grouped))))]
+    for component in sorted(grouped.values(), key=len, reverse=True):
+        min(bins, key=len).extend(component)
+    return [partition for partition in bins if partition]
+
+
+def solve_partition(
+    instance: ProblemInstance,
+    allocation_ids: Sequence[int],
+    optimization_budget: float
+) -> Tuple[SolutionStore, List[int], Dict[str, int]]:
+    """Schedule one partition in a worker process without touching the database"""
+    from .generator import TimetableGenerator
+
+    generator = TimetableGenerator(
+        instance=instance,
+        optimization_budget=optimization_budget
+    )
+    generator._load_allocations(instance.allocation(allocation_id) for allocation_id in allocation_ids)
+    generator._generate_initial_schedule()
+    generator._optimize_schedule()
+    return generator.export_placements(), generator.failed_allocation_ids(), generator.profiler.counters()
+
+
+def solve_seeded(
+    instance: ProblemInstance,
+    allocation_ids: Sequence[int],
+    seed: int,
+    optimization_budget: float
+) -> Tuple[SolutionStore, List[int], ScheduleScore, Dict[str, int]]:
+    """One randomized greedy run of a multi-start generation"""
+    from .generator import TimetableGenerator
+
+    generator = TimetableGenerator(
+        instance=instance,
+        seed=seed,
+        optimization_budget=optimization_budget
+    )
+    generator._load_allocations(instance.allocation(allocation_id) for allocation_id in allocation_ids)
+    generator._generate_initial_schedule()
+    generator._optimize_schedule()
+    return (
+        generator.export_placements(), generator.failed_allocation_ids(), generator.score(),
+        generator.profiler.counters()
+    )
+
+
+def solve_backtrack(
+    instance: ProblemInstance,
+    academic_year: str,
+    semester: int,
+    seed: int,
+    options: Dict
+) -> Tuple[Optional[SolutionStore], Dict]:
+    """One seeded backtracking search of a portfolio"""
+    from .backtrack import BacktrackTimetableGenerator
+
+    generator = BacktrackTimetableGenerator(
+        academic_year, semester, instance=instance, seed=seed,
+        stop_event=_stop_event, **options
+    )
+    timetable = generator.generate()
+    placements = generator.export_placements() if timetable is not None else None
+    return placements, generator.progress()
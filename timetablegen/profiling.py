@@ -0,0 +1,105 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.db import connection
+
+
+def _resident_kb() -> Optional[int]:
+    """Current resident set size, where the OS exposes it cheaply"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+class GenerationProfiler:
+    """Per-phase wall time, CPU time, queries, counters and memory.
+
+    The generator bumps the counters while it works; every phase records
+    how much each of them grew while it was running. Worker processes
+    profile their own share of the work and their counters are merged
+    back with :meth:`merge`; times, queries and memory are the parent's.
+
+    Memory is the change in resident set size over the phase (None where
+    /proc is not available). Tracing the Python heap for its peak slows
+    the solver several times over, so ``trace_memory`` is opt-in.
+    """
+
+    COUNTERS = ('slots_probed', 'rooms_probed', 'conflicts_detected', 'conflicts_resolved')
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.phases: List[Dict] = []
+        self.slots_probed = 0
+        self.rooms_probed = 0
+        self.conflicts_detected = 0
+        self.conflicts_resolved = 0
+
+    @contextmanager
+    def phase(self, name: str):
+        """Profile the enclosed block as one phase"""
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        counters = self.counters()
+        tracing = tracemalloc.is_tracing()
+        if self.trace_memory:
+            if tracing:
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        rss_start = _resident_kb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with connection.execute_wrapper(count_queries):
+                yield
+        finally:
+            record = {
+                'phase': name,
+                'wall_time': round(time.perf_counter() - wall_start, 4),
+                'cpu_time': round(time.process_time() - cpu_start, 4),
+                'queries': queries[0],
+            }
+            rss_end = _resident_kb()
+            record['rss_delta_kb'] = (
+                rss_end - rss_start if rss_start is not None and rss_end is not None else None
+            )
+            if self.trace_memory:
+                record['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+                if not tracing:
+                    tracemalloc.stop()
+            for counter, start in counters.items():
+                record[counter] = getattr(self, counter) - start
+            self.phases.append(record)
+
+    def counters(self) -> Dict[str, int]:
+        """Current counter values, as returned by worker processes"""
+        return {counter: getattr(self, counter) for counter in self.COUNTERS}
+
+    def merge(self, counters: Dict[str, int]):
+        """Add counters collected by a worker process"""
+        for counter, value in counters.items():
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def report(self) -> Dict:
+        """Phases in run order plus run totals"""
+        totals = {
+            key: sum(phase[key] for phase in self.phases)
+            for key in ('wall_time', 'cpu_time', 'queries') + self.COUNTERS
+        }
+        totals['wall_time'] = round(totals['wall_time'], 4)
+        totals['cpu_time'] = round(totals['cpu_time'], 4)
+        if self.trace_memory:
+            totals['peak_memory_kb'] = max(
+                (phase['peak_memory_kb'] for phase in self.phases), default=0
+            )
+        return {'phases': self.phases, 'totals': totals}
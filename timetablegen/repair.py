@@ -0,0 +1,253 @@
+from dataclasses import dataclass, field
+from datetime import time
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+
+from .generator import TimeSlot, TimetableGenerator
+from .instance import AllocationRecord, ProblemInstance
+from .models import Timetable, TimetableVersion
+from .resources import day_mask, slot_mask, week_mask
+
+
+@dataclass
+class StaffUnavailability:
+    """A staff member who cannot teach on a day, or part of it"""
+    staff_id: int
+    day: str
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+
+    def mask(self) -> int:
+        if self.start_time is None or self.end_time is None:
+            return day_mask(self.day)
+        return slot_mask(self.day, self.start_time, self.end_time)
+
+
+@dataclass
+class ChangeSet:
+    """Changes to apply to the current timetable without regenerating it"""
+    unavailable_staff: List[StaffUnavailability] = field(default_factory=list)
+    offline_rooms: List[int] = field(default_factory=list)
+    added_allocations: List[int] = field(default_factory=list)
+    removed_allocations: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ChangeSet':
+        """Build a change set from request data"""
+        return cls(
+            unavailable_staff=[
+                StaffUnavailability(
+                    staff_id=int(item['staff_id']),
+                    day=item['day'],
+                    start_time=time.fromisoformat(item['start_time']) if item.get('start_time') else None,
+                    end_time=time.fromisoformat(item['end_time']) if item.get('end_time') else None
+                )
+                for item in data.get('unavailable_staff', [])
+            ],
+            offline_rooms=[int(room_id) for room_id in data.get('offline_rooms', [])],
+            added_allocations=[int(a) for a in data.get('added_allocations', [])],
+            removed_allocations=[int(a) for a in data.get('removed_allocations', [])],
+        )
+
+    def to_dict(self) -> Dict:
+        """The change set as JSON-safe data :meth:`from_dict` reads back"""
+        return {
+            'unavailable_staff': [
+                {
+                    'staff_id': item.staff_id,
+                    'day': item.day,
+                    'start_time': item.start_time.isoformat() if item.start_time else None,
+                    'end_time': item.end_time.isoformat() if item.end_time else None,
+                }
+                for item in self.unavailable_staff
+            ],
+            'offline_rooms': list(self.offline_rooms),
+            'added_allocations': list(self.added_allocations),
+            'removed_allocations': list(self.removed_allocations),
+        }
+
+
+class IncrementalTimetableGenerator(TimetableGenerator):
+    """Repairs the stored timetable for a change set.
+
+    The active timetable version is loaded as the starting state, only
+    entries hit by the change set (and any conflicts they leave behind)
+    are unassigned and placed again, and only rows that actually changed
+    are written back to that version. With ``academic_year`` or
+    ``semester`` set, only that term's allocations are repaired; other
+    classes' entries of the term keep their staff and rooms busy.
+    """
+
+    def __init__(self, academic_year: Optional[str] = None, semester: Optional[int] = None, **kwargs):
+        if kwargs.get('instance') is None:
+            kwargs['instance'] = ProblemInstance.load(academic_year, semester)
+        super().__init__(**kwargs)
+        self.academic_year = academic_year
+        self.semester = semester
+        # Slots loaded from the database and the rows they came from
+        self.loaded_entries: Dict[TimeSlot, Timetable] = {}
+
+    def repair(self, change_set: ChangeSet) -> Dict:
+        """Apply a change set and save the difference"""
+        self.version = TimetableVersion.active()
+        if self.version is None:
+            self.version = TimetableVersion.objects.create(label='Repair')
+            self.version.publish()
+
+        with self._phase('load', 0.0):
+            self._prepare_allocations()
+            # Only affected allocations are queued below
+            self.pending_allocations = []
+            stale_entries = self._load_current_timetable(change_set)
+
+        with self._phase('repair', 0.3):
+            affected = self._unassign_affected(change_set)
+            self._apply_blocks(change_set)
+
+            # Entries clashing in the stored timetable are direct conflicts too;
+            # whatever the conflict pass gives up on is placed again in full
+            self._resolve_conflicts()
+            for _, allocation in self.failed_allocations:
+                self._unplace_allocation(allocation)
+            self.failed_allocations = []
+
+            # Added allocations, and any whose rows were dropped as stale,
+            # have nothing placed yet
+            removed_ids = set(change_set.removed_allocations)
+            for allocation_id, allocation in self.allocations.items():
+                if allocation_id not in removed_ids and allocation_id not in self.stream_allocations:
+                    affected[allocation_id] = allocation
+            self._load_allocations(affected.values())
+            self._generate_initial_schedule()
+
+        with self._phase('save', 0.9):
+            removed, added = self._save_changes(stale_entries)
+        self._report_progress('done', 1.0)
+        return {
+            'removed': removed,
+            'added': added,
+            'unscheduled': self.failed_allocation_ids(),
+        }
+
+    def _load_current_timetable(self, change_set: ChangeSet) -> List[Timetable]:
+        """Place stored entries, returning rows that no longer belong to an allocation"""
+        removed = set(change_set.removed_allocations)
+        stale = []
+
+        entries = Timetable.objects.filter(version=self.version).select_related('class_id')
+        if self.semester is not None:
+            entries = entries.filter(semester=self.semester)
+        by_key = self._allocations_by_key()
+
+        for entry in entries:
+            slot = TimeSlot(entry.day_of_week, entry.start_time, entry.end_time)
+            if entry.allocation_id is not None:
+                allocation = self.allocations.get(entry.allocation_id)
+            else:
+                allocation = by_key.get((entry.class_id_id, entry.module_id_id, entry.staff_id_id))
+
+            if allocation is None and not self._in_scope(entry):
+                mask = self.resource_manager.slot_mask(slot)
+                self.resource_manager.block_staff(entry.staff_id_id, mask)
+                self.resource_manager.block_room(entry.room_id_id, mask)
+                continue
+
+            room = self.room_catalogue.rooms.get(entry.room_id_id)
+            if allocation is None or room is None or allocation.allocation_id in removed:
+                stale.append(entry)
+                continue
+
+            self._place(allocation, slot, room)
+            self.loaded_entries[slot] = entry
+
+        return stale
+
+    def _allocations_by_key(self) -> Dict[Tuple[int, int, int], AllocationRecord]:
+        """Allocations by (class, module, staff) for rows saved without an allocation"""
+        return {
+            (allocation.class_id.Class_id, allocation.module_id.module_id, allocation.staff_id.staff_id): allocation
+            for allocation in self.allocations.values()
+        }
+
+    def _in_scope(self, entry: Timetable) -> bool:
+        """Whether an entry belongs to the term being repaired"""
+        if self.academic_year is None:
+            return True
+        return entry.class_id is not None and entry.class_id.academic_year == self.academic_year
+
+    def _unassign_affected(self, change_set: ChangeSet) -> Dict:
+        """Unplace entries hit by the change set, returning allocations to re-place"""
+        manager = self.resource_manager
+        affected_slots = set()
+
+        for unavailable in change_set.unavailable_staff:
+            mask = unavailable.mask()
+            affected_slots.update(
+                slot for slot in manager.staff_schedule.get(unavailable.staff_id, [])
+                if manager.slot_mask(slot) & mask
+            )
+
+        for room_id in change_set.offline_rooms:
+            affected_slots.update(manager.room_schedule.get(room_id, []))
+
+        affected = {}
+        for slot in affected_slots:
+            allocation = self._unplace(slot)
+            if allocation is not None:
+                affected[allocation.allocation_id] = allocation
+
+        # A session split in two is placed again as a whole
+        for allocation in affected.values():
+            self._unplace_allocation(allocation)
+        return affected
+
+    def _unplace_allocation(self, allocation: AllocationRecord):
+        """Unplace every slot an allocation still holds"""
+        for slot in list(self.stream_allocations.get(allocation.allocation_id, [])):
+            self._unplace(slot)
+
+    def _apply_blocks(self, change_set: ChangeSet):
+        for unavailable in change_set.unavailable_staff:
+            self.resource_manager.block_staff(unavailable.staff_id, unavailable.mask())
+        for room_id in change_set.offline_rooms:
+            self.resource_manager.block_room(room_id, week_mask())
+
+    def _save_changes(self, stale_entries: List[Timetable]) -> Tuple[int, int]:
+        """Delete rows that were moved or dropped and insert the new ones"""
+        unchanged = {
+            slot for slot, entry in self.loaded_entries.items()
+            if slot in self.slot_allocations and
+            self.slot_rooms[slot].room_id == entry.room_id_id
+        }
+        removed_ids = [entry.timetable_id for entry in stale_entries]
+        removed_ids.extend(
+            entry.timetable_id
+            for slot, entry in self.loaded_entries.items()
+            if slot not in unchanged
+        )
+
+        new_entries = []
+        for slot, allocation in self.slot_allocations.items():
+            if slot in unchanged:
+                continue
+            new_entries.append(
+                Timetable(
+                    version=self.version,
+                    allocation_id=allocation.allocation_id,
+                    module_id_id=allocation.module_id.module_id,
+                    room_id_id=self.slot_rooms[slot].room_id,
+                    staff_id_id=allocation.staff_id.staff_id,
+                    class_id_id=allocation.class_id.Class_id,
+                    class_stream=allocation.class_id.class_stream,
+                    day_of_week=slot.day,
+                    start_time=slot.start_time,
+                    end_time=slot.end_time,
+                    semester=allocation.module_id.semester
+                )
+            )
+
+        with transaction.atomic():
+            Timetable.objects.filter(timetable_id__in=removed_ids).delete()
+            Timetable.objects.bulk_create(new_entries)
+        return len(removed_ids), len(new_entries)
@@ -0,0 +1,214 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .constraints import TimetableConstraints
+from .slotgrid import to_minutes
+
+
+def slot_mask(day: str, start_time: time, end_time: time) -> int:
+    """Bitmask of the occupancy units covered by a slot.
+
+    Bit ``day_index * UNITS_PER_DAY + unit`` stands for one SLOT_MINUTES
+    wide unit of the week. Starts are rounded down and ends rounded up so
+    two slots that share a minute always share a bit.
+    """
+    width = TimetableConstraints.SLOT_MINUTES
+    first = to_minutes(start_time) // width
+    last = -(-to_minutes(end_time) // width)
+    if last <= first:
+        return 0
+    offset = TimetableConstraints.DAY_INDEX[day] * TimetableConstraints.UNITS_PER_DAY
+    return ((1 << (last - first)) - 1) << (offset + first)
+
+
+def day_mask(day: str) -> int:
+    """Bitmask covering a whole day"""
+    offset = TimetableConstraints.DAY_INDEX[day] * TimetableConstraints.UNITS_PER_DAY
+    return ((1 << TimetableConstraints.UNITS_PER_DAY) - 1) << offset
+
+
+def week_mask() -> int:
+    """Bitmask covering every teaching day"""
+    mask = 0
+    for day in TimetableConstraints.DAYS:
+        mask |= day_mask(day)
+    return mask
+
+
+class ResourceManager:
+    """Tracks staff, class and room bookings as week-long bitmasks.
+
+    An availability check is a single AND against the resource's mask and
+    a booking is a single OR. Bits booked twice are remembered in a clash
+    mask so conflict detection only has to look at resources that
+    actually clash.
+    """
+
+    def __init__(self):
+        self.staff_schedule: Dict[int, List] = defaultdict(list)
+        self.class_schedule: Dict[int, List] = defaultdict(list)
+        self.room_schedule: Dict[int, List] = defaultdict(list)
+
+        self.staff_masks: Dict[int, int] = {}
+        self.class_masks: Dict[int, int] = {}
+        self.room_masks: Dict[int, int] = {}
+
+        self.staff_clashes: Dict[int, int] = {}
+        self.class_clashes: Dict[int, int] = {}
+        self.room_clashes: Dict[int, int] = {}
+
+        # Time a staff member or room cannot be used at all
+        self.staff_blocked: Dict[int, int] = {}
+        self.room_blocked: Dict[int, int] = {}
+
+        self._mask_cache: Dict[int, int] = {}
+
+    def slot_mask(self, slot) -> int:
+        """Cached occupancy mask for a slot"""
+        key = slot.key
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = slot_mask(slot.day, slot.start_time, slot.end_time)
+            self._mask_cache[key] = mask
+        return mask
+
+    def is_staff_available(self, staff_id: int, slot) -> bool:
+        return not self.staff_masks.get(staff_id, 0) & self.slot_mask(slot)
+
+    def is_class_available(self, class_id: int, slot) -> bool:
+        return not self.class_masks.get(class_id, 0) & self.slot_mask(slot)
+
+    def is_room_available(self, room_id: int, slot) -> bool:
+        return not self.room_masks.get(room_id, 0) & self.slot_mask(slot)
+
+    def book(self, staff_id: int, class_id: int, room_id: int, slot):
+        """Reserve staff, class and room for a slot"""
+        mask = self.slot_mask(slot)
+        self._book(self.staff_masks, self.staff_clashes, staff_id, mask)
+        self._book(self.class_masks, self.class_clashes, class_id, mask)
+        self.staff_schedule[staff_id].append(slot)
+        self.class_schedule[class_id].append(slot)
+        if room_id is not None:
+            self._book(self.room_masks, self.room_clashes, room_id, mask)
+            self.room_schedule[room_id].append(slot)
+
+    def release(self, staff_id: int, class_id: int, room_id: int, slot):
+        """Undo a booking made with :meth:`book`"""
+        mask = self.slot_mask(slot)
+        self._release(self.staff_masks, self.staff_clashes, self.staff_schedule, self.staff_blocked, staff_id, slot, mask)
+        self._release(self.class_masks, self.class_clashes, self.class_schedule, {}, class_id, slot, mask)
+        if room_id is not None:
+            self._release(self.room_masks, self.room_clashes, self.room_schedule, self.room_blocked, room_id, slot, mask)
+
+    def block_staff(self, staff_id: int, mask: int):
+        """Make a staff member unavailable for the bits in ``mask``"""
+        self.staff_blocked[staff_id] = self.staff_blocked.get(staff_id, 0) | mask
+        self.staff_masks[staff_id] = self.staff_masks.get(staff_id, 0) | mask
+
+    def block_room(self, room_id: int, mask: int):
+        """Take a room out of use for the bits in ``mask``"""
+        self.room_blocked[room_id] = self.room_blocked.get(room_id, 0) | mask
+        self.room_masks[room_id] = self.room_masks.get(room_id, 0) | mask
+
+    def clashing_staff(self) -> List[int]:
+        return [staff_id for staff_id, clash in self.staff_clashes.items() if clash]
+
+    def clashing_classes(self) -> List[int]:
+        return [class_id for class_id, clash in self.class_clashes.items() if clash]
+
+    def clashing_rooms(self) -> List[int]:
+        return [room_id for room_id, clash in self.room_clashes.items() if clash]
+
+    def _book(self, masks: Dict[int, int], clashes: Dict[int, int], key: int, mask: int):
+        current = masks.get(key, 0)
+        overlap = current & mask
+        if overlap:
+            clashes[key] = clashes.get(key, 0) | overlap
+        masks[key] = current | mask
+
+    def _release(
+        self,
+        masks: Dict[int, int],
+        clashes: Dict[int, int],
+        schedules: Dict[int, List],
+        blocked: Dict[int, int],
+        key: int,
+        slot,
+        mask: int
+    ):
+        schedule = schedules.get(key)
+        if schedule is None or slot not in schedule:
+            return
+        schedule.remove(slot)
+
+        if not clashes.get(key, 0):
+            masks[key] = (masks.get(key, 0) & ~mask) | blocked.get(key, 0)
+            return
+
+        # Clashing bits are shared by several bookings, rebuild from the
+        # remaining schedule rather than clearing them blindly
+        combined, clashes[key] = self._rebuild(schedule)
+        masks[key] = combined | blocked.get(key, 0)
+
+    def _rebuild(self, slots: Iterable) -> Tuple[int, int]:
+        combined = 0
+        clash = 0
+        for slot in slots:
+            mask = self.slot_mask(slot)
+            clash |= combined & mask
+            combined |= mask
+        return combined, clash
+
+
+class RoomCatalogue:
+    """In-memory room index keyed by room type and sorted by capacity.
+
+    Loaded once per generation run so that finding the smallest free room
+    of a type for a class size is a bisect plus occupancy checks instead of
+    a query per probe.
+    """
+
+    def __init__(self, rooms: Iterable):
+        grouped = defaultdict(list)
+        for room in rooms:
+            grouped[room.room_type].append(room)
+
+        self.rooms_by_type: Dict[str, List] = {}
+        self._capacities: Dict[str, List[int]] = {}
+        for room_type, typed_rooms in grouped.items():
+            typed_rooms.sort(key=lambda room: (room.capacity, room.room_id))
+            self.rooms_by_type[room_type] = typed_rooms
+            self._capacities[room_type] = [room.capacity for room in typed_rooms]
+
+        self.rooms = {
+            room.room_id: room
+            for typed_rooms in self.rooms_by_type.values()
+            for room in typed_rooms
+        }
+
+    def candidates(self, room_type: str, min_capacity: int) -> List:
+        """Rooms of a type holding at least ``min_capacity``, smallest first"""
+        capacities = self._capacities.get(room_type)
+        if not capacities:
+            return []
+        start = bisect_left(capacities, min_capacity)
+        return self.rooms_by_type[room_type][start:]
+
+    def find_free(
+        self,
+        room_type: str,
+        min_capacity: int,
+        is_free: Callable[[int], bool]
+    ) -> Optional[object]:
+        """Smallest suitable room for which ``is_free(room_id)`` holds"""
+        capacities = self._capacities.get(room_type)
+        if not capacities:
+            return None
+        rooms = self.rooms_by_type[room_type]
+        for index in range(bisect_left(capacities, min_capacity), len(rooms)):
+            room = rooms[index]
+            if is_free(room.room_id):
+                return room
+        return None
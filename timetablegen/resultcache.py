@@ -0,0 +1,150 @@
+import hashlib
+import json
+import pickle
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .constraints import TimetableConstraints
+from .instance import ProblemInstance
+from .solution import SolutionStore
+
+KEY_PREFIX = 'timetable:result:'
+INDEX_KEY = KEY_PREFIX + 'index'
+LOCK_KEY = KEY_PREFIX + 'lock'
+
+# Seconds a writer waits for the index lock, and how long a lock left by
+# a crashed writer lives
+LOCK_WAIT = 2
+LOCK_TIMEOUT = 10
+
+# Bump when a solver change makes stored results stale
+FORMAT_VERSION = 1
+
+
+def fingerprint(instance: ProblemInstance, parameters: Dict) -> str:
+    """Stable hash of everything a generation result depends on"""
+    payload = {
+        'format': FORMAT_VERSION,
+        'parameters': sorted(parameters.items()),
+        'constraints': [
+            TimetableConstraints.DAYS,
+            [str(value) for value in (
+                TimetableConstraints.DAY_START, TimetableConstraints.DAY_END,
+                TimetableConstraints.BREAKFAST_START, TimetableConstraints.BREAKFAST_END,
+                TimetableConstraints.LUNCH_START, TimetableConstraints.LUNCH_END,
+                TimetableConstraints.MIN_DURATION, TimetableConstraints.MAX_DURATION,
+            )],
+            sorted(
+                (name, str(window['start_time']), str(window['end_time']))
+                for name, window in TimetableConstraints.PROGRAM_CONSTRAINTS.items()
+            ),
+        ],
+        'programs': [
+            (p.program_id, p.program_name, p.nta_level, p.dept_id) for p in instance.programs
+        ],
+        'modules': [
+            (m.module_id, m.module_type, m.module_credit, m.semester) for m in instance.modules
+        ],
+        'rooms': [(r.room_id, r.room_type, r.capacity) for r in instance.rooms],
+        'staff': [(s.staff_id, s.dept_id) for s in instance.staff],
+        'classes': [
+            (c.Class_id, c.class_capacity, c.class_stream, c.program_id.program_id)
+            for c in instance.classes
+        ],
+        'allocations': [
+            (a.allocation_id, a.class_id.Class_id, a.module_id.module_id,
+             a.staff_id.staff_id, a.program_id.program_id)
+            for a in instance.allocations
+        ],
+        'preferences': instance.preferences,
+    }
+    encoded = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def available() -> bool:
+    """Whether the cache is shared by the web and worker processes.
+
+    A per-process or dummy cache would only ever hit in the process that
+    stored the result, so result caching is off with those backends.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+@contextmanager
+def _index_lock():
+    """Hold the index lock, yielding whether it was acquired in time"""
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            yield False
+            return
+        time.sleep(0.05)
+    try:
+        yield True
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def get_result(key: str) -> Optional[Tuple[SolutionStore, List[int]]]:
+    """Placements and unscheduled allocation ids stored for a fingerprint.
+
+    The cache only saves work, so an unreachable backend or a missing
+    cache table counts as a miss.
+    """
+    try:
+        return cache.get(KEY_PREFIX + key)
+    except Exception:
+        return None
+
+
+def store_result(key: str, placements: SolutionStore, failed_ids: List[int]):
+    """Store a result under the TTL, entry size and entry count limits.
+
+    A backend error skips the store rather than failing the generation.
+    """
+    result = (placements, failed_ids)
+    max_bytes = getattr(settings, 'TIMETABLE_RESULT_CACHE_MAX_BYTES', 5 * 1024 * 1024)
+    if len(pickle.dumps(result)) > max_bytes:
+        return
+
+    ttl = getattr(settings, 'TIMETABLE_RESULT_CACHE_TTL', 24 * 60 * 60)
+    max_entries = getattr(settings, 'TIMETABLE_RESULT_CACHE_ENTRIES', 20)
+
+    try:
+        _store_indexed(key, result, ttl, max_entries)
+    except Exception:
+        pass
+
+
+def _store_indexed(key: str, result: Tuple, ttl: int, max_entries: int):
+    # The index is read, changed and written back, so concurrent writers
+    # take turns; a result that cannot be indexed is not stored at all
+    with _index_lock() as locked:
+        if not locked:
+            return
+        cache.set(KEY_PREFIX + key, result, ttl)
+
+        # Oldest entries beyond the limit are evicted first
+        index = [entry for entry in cache.get(INDEX_KEY, []) if entry != key]
+        index.append(key)
+        evicted, index = index[:-max_entries], index[-max_entries:]
+        if evicted:
+            cache.delete_many([KEY_PREFIX + entry for entry in evicted])
+        cache.set(INDEX_KEY, index, None)
+
+
+def invalidate() -> int:
+    """Drop every cached generation result, returning how many were known"""
+    with _index_lock():
+        # Without the lock a racing writer may re-add one entry, which
+        # still expires with its TTL
+        index = cache.get(INDEX_KEY, [])
+        cache.delete_many([KEY_PREFIX + entry for entry in index] + [INDEX_KEY])
+    return len(index)
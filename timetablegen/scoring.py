@@ -0,0 +1,57 @@
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+# Idle gaps inside this range (in minutes) are too short to use and too
+# long to ignore
+GAP_MIN = 30
+GAP_MAX = 120
+
+# Teaching longer than this without a break is penalised per extra minute
+MAX_CONSECUTIVE = 4 * 60
+
+# Changing room between back-to-back sessions
+ROOM_CHANGE = 15
+
+
+class ScheduleScore(NamedTuple):
+    """Quality of a schedule, lower is better and compared field by field"""
+    unscheduled: int
+    penalty: int
+
+
+def day_penalty(intervals: List[Tuple[int, int, Optional[Hashable]]]) -> int:
+    """Soft-constraint penalty for one resource's (start, end, room) sessions on one day"""
+    if len(intervals) < 2:
+        return 0
+
+    intervals = sorted(intervals, key=lambda interval: interval[:2])
+    penalty = 0
+    run = intervals[0][1] - intervals[0][0]
+    for (_, previous_end, previous_room), (start, end, room) in zip(intervals, intervals[1:]):
+        gap = start - previous_end
+        if GAP_MIN < gap < GAP_MAX:
+            penalty += gap
+        if gap <= GAP_MIN and room != previous_room:
+            penalty += ROOM_CHANGE
+        if gap <= 0:
+            run += end - start
+        else:
+            run = end - start
+        if run > MAX_CONSECUTIVE:
+            penalty += min(run - MAX_CONSECUTIVE, end - start)
+    return penalty
+
+
+def schedule_penalty(
+    schedules: Dict[int, Iterable],
+    room_of: Callable[[object], Optional[Hashable]]
+) -> int:
+    """Total day penalty over per-resource lists of placed slots"""
+    penalty = 0
+    for slots in schedules.values():
+        days = defaultdict(list)
+        for slot in slots:
+            days[slot.day].append((slot.start_minute, slot.end_minute, room_of(slot)))
+        for intervals in days.values():
+            penalty += day_penalty(intervals)
+    return penalty
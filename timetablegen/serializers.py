@@ -2,7 +2,7 @@ from rest_framework import serializers
 from .models import (
     Department, Program, Module, Room, Staff, 
     Timetable, TeacherPreference, Class, 
-    Conflict, ClassModuleAllocation
+    Conflict, ClassModuleAllocation, GenerationJob, TimetableVersion
 )
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -33,10 +33,17 @@ class StaffSerializer(serializers.ModelSerializer):
             'user': {'read_only': True}
         }
 
+class TimetableVersionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TimetableVersion
+        fields = '__all__'
+        read_only_fields = ['is_active', 'created_at', 'published_at']
+
 class TimetableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Timetable
         fields = '__all__'
+        read_only_fields = ['version']
 
 class TeacherPreferenceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -56,4 +63,13 @@ class ConflictSerializer(serializers.ModelSerializer):
 class ClassModuleAllocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClassModuleAllocation
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__' 
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = '__all__'
+        read_only_fields = [
+            'status', 'phase', 'progress', 'error', 'profile', 'result', 'requested_by',
+            'created_at', 'started_at', 'finished_at'
+        ]
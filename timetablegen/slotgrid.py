@@ -0,0 +1,90 @@
+from datetime import time, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+from .constraints import TimetableConstraints
+
+
+def to_minutes(value: time) -> int:
+    """Minutes since midnight for a time of day"""
+    return value.hour * 60 + value.minute
+
+
+class SlotGrid:
+    """Teaching windows, breaks and session lengths compiled to integers.
+
+    Every time of day is a minute offset from midnight. The legal sessions
+    for a (program, duration) pair are computed once and cached, so the
+    generator never builds datetimes inside its search loops.
+    """
+
+    def __init__(self):
+        self.breaks: List[Tuple[int, int]] = [
+            (to_minutes(TimetableConstraints.BREAKFAST_START),
+             to_minutes(TimetableConstraints.BREAKFAST_END)),
+            (to_minutes(TimetableConstraints.LUNCH_START),
+             to_minutes(TimetableConstraints.LUNCH_END)),
+        ]
+        self._windows: Dict[str, Tuple[int, int]] = {}
+        self._sessions: Dict[Tuple[str, int], List[Tuple[int, int]]] = {}
+
+    @staticmethod
+    def duration_minutes(duration: Union[timedelta, int]) -> int:
+        if isinstance(duration, timedelta):
+            return int(duration.total_seconds()) // 60
+        return duration
+
+    def window(self, program_name: Optional[str]) -> Tuple[int, int]:
+        """Teaching window of a program, or of the whole day for None"""
+        window = self._windows.get(program_name)
+        if window is None:
+            if program_name is None:
+                constraints = TimetableConstraints.DEFAULT_PROGRAM_CONSTRAINTS
+            else:
+                constraints = TimetableConstraints.for_program(program_name)
+            window = (
+                to_minutes(constraints['start_time']),
+                to_minutes(constraints['end_time'])
+            )
+            self._windows[program_name] = window
+        return window
+
+    def sessions(self, program_name: Optional[str], duration: Union[timedelta, int]) -> List[Tuple[int, int]]:
+        """Cached (start, end) minute pairs a session may occupy on any day"""
+        minutes = self.duration_minutes(duration)
+        key = (program_name, minutes)
+        sessions = self._sessions.get(key)
+        if sessions is None:
+            sessions = self._compile(*self.window(program_name), minutes)
+            self._sessions[key] = sessions
+        return sessions
+
+    def day_sessions(self, duration: Union[timedelta, int]) -> List[Tuple[int, int]]:
+        """Sessions over the whole teaching day, whatever the program window"""
+        return self.sessions(None, duration)
+
+    def break_at(self, minute: int) -> Union[Tuple[int, int], None]:
+        """Break covering a minute offset, if any"""
+        for break_start, break_end in self.breaks:
+            if break_start <= minute < break_end:
+                return break_start, break_end
+        return None
+
+    def _compile(self, window_start: int, window_end: int, duration: int) -> List[Tuple[int, int]]:
+        sessions = []
+        if duration <= 0:
+            return sessions
+
+        current = window_start
+        while current < window_end:
+            # Sessions never start inside a break
+            current_break = self.break_at(current)
+            if current_break:
+                current = current_break[1]
+                continue
+
+            end = current + duration
+            if end > window_end:
+                break
+            sessions.append((current, end))
+            current = end
+        return sessions
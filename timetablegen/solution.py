@@ -0,0 +1,106 @@
+from array import array
+from datetime import time
+from typing import Dict, Iterator, Tuple
+
+from .constraints import TimetableConstraints
+from .slotgrid import to_minutes
+
+# Interned times of day by minute offset
+_TIMES: Dict[int, time] = {}
+
+
+def minute_time(minutes: int) -> time:
+    """Shared time of day object for a minute offset"""
+    value = _TIMES.get(minutes)
+    if value is None:
+        value = _TIMES[minutes] = time(minutes // 60, minutes % 60)
+    return value
+
+
+class TimeSlot:
+    """Day and time of one placed session, stored as small integers.
+
+    A slot is the handle of its session in the generator's maps, so slots
+    compare by identity; two sessions at the same time are still two
+    slots. ``key`` packs the value into one int for value-keyed caches,
+    and the day names and times handed out are interned.
+    """
+
+    __slots__ = ('day_index', 'start_minute', 'end_minute')
+
+    def __init__(self, day: str, start_time: time, end_time: time):
+        self.day_index = TimetableConstraints.DAY_INDEX[day]
+        self.start_minute = to_minutes(start_time)
+        self.end_minute = to_minutes(end_time)
+
+    @classmethod
+    def from_minutes(cls, day_index: int, start_minute: int, end_minute: int) -> 'TimeSlot':
+        slot = cls.__new__(cls)
+        slot.day_index = day_index
+        slot.start_minute = start_minute
+        slot.end_minute = end_minute
+        return slot
+
+    @property
+    def day(self) -> str:
+        return TimetableConstraints.DAYS[self.day_index]
+
+    @property
+    def start_time(self) -> time:
+        return minute_time(self.start_minute)
+
+    @property
+    def end_time(self) -> time:
+        return minute_time(self.end_minute)
+
+    @property
+    def key(self) -> int:
+        return (self.day_index << 22) | (self.start_minute << 11) | self.end_minute
+
+    def overlaps(self, other: 'TimeSlot') -> bool:
+        return self.day_index == other.day_index and (
+            self.start_minute < other.end_minute and other.start_minute < self.end_minute
+        )
+
+    def __repr__(self):
+        return f"TimeSlot({self.day} {self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+
+class SolutionStore:
+    """Placements stored column-wise in typed arrays.
+
+    Row ``i`` is the session of allocation index ``allocation[i]`` on day
+    ``day[i]`` from ``start[i]`` to ``end[i]`` minutes in room index
+    ``room[i]``; indices refer to the generator's ProblemInstance. Copies
+    are a handful of flat buffers, which keeps snapshots and results sent
+    back from worker processes small.
+    """
+
+    __slots__ = ('allocation', 'day', 'start', 'end', 'room')
+
+    def __init__(self):
+        self.allocation = array('i')
+        self.day = array('b')
+        self.start = array('h')
+        self.end = array('h')
+        self.room = array('i')
+
+    def append(self, allocation_index: int, day_index: int, start: int, end: int, room_index: int):
+        self.allocation.append(allocation_index)
+        self.day.append(day_index)
+        self.start.append(start)
+        self.end.append(end)
+        self.room.append(room_index)
+
+    def __len__(self) -> int:
+        return len(self.allocation)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        return zip(self.allocation, self.day, self.start, self.end, self.room)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, column in zip(self.__slots__, state):
+            setattr(self, name, column)
@@ -0,0 +1,171 @@
+import random
+from dataclasses import dataclass
+from datetime import time
+from typing import Dict
+
+from django.db import transaction
+
+from .constraints import TimetableConstraints
+from .models import (
+    Department, Program, Module, Room, Staff, Class,
+    ClassModuleAllocation, TeacherPreference
+)
+
+# Room types with the capacities rooms of that type are built with
+ROOM_TYPES = {
+    'Lecture': [60, 80, 120, 150, 200, 300],
+    'Laboratory': [30, 40, 50],
+    'Seminar': [25, 35, 45],
+}
+
+# Share of modules taught in each room type
+MODULE_TYPE_WEIGHTS = {'Lecture': 0.65, 'Laboratory': 0.2, 'Seminar': 0.15}
+
+STREAMS = 'ABCDEFGH'
+
+
+@dataclass
+class SyntheticConfig:
+    """Shape of a generated institution"""
+    departments: int = 3
+    programs_per_department: int = 2
+    classes_per_program: int = 3
+    streams_per_class: int = 1
+    staff_per_department: int = 8
+    rooms: int = 20
+    modules_per_class: int = 5
+    preferences_per_staff: int = 2
+    academic_year: str = '2025/2026'
+    semester: int = 1
+    seed: int = 0
+
+    @classmethod
+    def preset(cls, size: str, seed: int = 0) -> 'SyntheticConfig':
+        presets = {
+            'small': cls(seed=seed),
+            'medium': cls(
+                departments=6, programs_per_department=3, classes_per_program=3,
+                streams_per_class=2, staff_per_department=15, rooms=45, seed=seed
+            ),
+            'large': cls(
+                departments=12, programs_per_department=4, classes_per_program=4,
+                streams_per_class=2, staff_per_department=25, rooms=120,
+                modules_per_class=6, seed=seed
+            ),
+        }
+        return presets[size]
+
+
+def build_institution(config: SyntheticConfig) -> Dict[str, int]:
+    """Create a seeded synthetic institution and return row counts"""
+    rng = random.Random(config.seed)
+    counts = {}
+
+    with transaction.atomic():
+        rooms = []
+        room_types = list(ROOM_TYPES)
+        for index in range(config.rooms):
+            room_type = room_types[index % len(room_types)] if index < len(room_types) else rng.choices(
+                room_types, weights=[MODULE_TYPE_WEIGHTS[t] for t in room_types]
+            )[0]
+            # The first room of each type is its largest, so every class
+            # a module type is given to has somewhere to sit
+            capacity = (
+                max(ROOM_TYPES[room_type]) if index < len(room_types)
+                else rng.choice(ROOM_TYPES[room_type])
+            )
+            rooms.append(Room(
+                room_name=f"{room_type} {index + 1}",
+                room_type=room_type,
+                capacity=capacity,
+                building_name=f"Block {chr(ord('A') + index % 6)}",
+                room_no=f"R{index + 1:03d}"
+            ))
+        Room.objects.bulk_create(rooms)
+        counts['rooms'] = len(rooms)
+
+        counts.update(departments=0, programs=0, classes=0, staff=0, modules=0, allocations=0)
+        largest = {room_type: 0 for room_type in room_types}
+        for room in rooms:
+            largest[room.room_type] = max(largest[room.room_type], room.capacity)
+
+        for dept_index in range(config.departments):
+            department = Department.objects.create(dept_name=f"Department {dept_index + 1}")
+            staff = Staff.objects.bulk_create([
+                Staff(
+                    staff_name=f"Staff {dept_index + 1}.{index + 1}",
+                    staff_type='Full-time',
+                    staff_title=rng.choice(['Dr', 'Mr', 'Ms', 'Prof']),
+                    dept_id=department
+                )
+                for index in range(config.staff_per_department)
+            ])
+            counts['departments'] += 1
+            counts['staff'] += len(staff)
+
+            TeacherPreference.objects.bulk_create([
+                TeacherPreference(
+                    staff_id=member,
+                    day_of_week=rng.choice(TimetableConstraints.DAYS),
+                    start_time=time(rng.choice([8, 11, 14]), 0),
+                    end_time=time(rng.choice([10, 13, 17]), 0),
+                    preference_weight=rng.randint(1, 5)
+                )
+                for member in staff
+                for _ in range(config.preferences_per_staff)
+            ])
+
+            for program_index in range(config.programs_per_department):
+                program = Program.objects.create(
+                    program_name=f"Program {dept_index + 1}.{program_index + 1}",
+                    dept_id=department,
+                    nta_level=rng.choice(['4', '5', '6', '7', '8'])
+                )
+                counts['programs'] += 1
+
+                for year in range(1, config.classes_per_program + 1):
+                    classes = Class.objects.bulk_create([
+                        Class(
+                            program_id=program,
+                            Class_name=f"{program.program_name} Y{year}",
+                            class_capacity=rng.choice([25, 35, 45, 60, 90]),
+                            academic_year=config.academic_year,
+                            class_stream=STREAMS[stream]
+                        )
+                        for stream in range(config.streams_per_class)
+                    ])
+                    counts['classes'] += len(classes)
+
+                    # Every stream takes every module, so a module type is
+                    # only used if a room of that type holds the largest stream
+                    needed = max(class_obj.class_capacity for class_obj in classes)
+                    module_types = [t for t in MODULE_TYPE_WEIGHTS if largest[t] >= needed]
+                    weights = [MODULE_TYPE_WEIGHTS[t] for t in module_types]
+
+                    modules = Module.objects.bulk_create([
+                        Module(
+                            module_code=f"M{dept_index + 1}{program_index + 1}{year}{index + 1:02d}",
+                            module_name=f"Module {program.program_name} Y{year} #{index + 1}",
+                            module_type=rng.choices(module_types, weights=weights)[0],
+                            module_year=year,
+                            semester=config.semester,
+                            nta_level=program.nta_level,
+                            module_credit=rng.choice([7, 10, 12, 15])
+                        )
+                        for index in range(config.modules_per_class)
+                    ])
+                    counts['modules'] += len(modules)
+
+                    allocations = ClassModuleAllocation.objects.bulk_create([
+                        ClassModuleAllocation(
+                            class_id=class_obj,
+                            module_id=module,
+                            staff_id=rng.choice(staff),
+                            program_id=program
+                        )
+                        for class_obj in classes
+                        for module in modules
+                    ])
+                    counts['allocations'] += len(allocations)
+
+    return counts
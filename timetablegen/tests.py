@@ -1,5 +1,66 @@
-from django.test import TestCase
-from .models import Module
+import heapq
+import random
+import tracemalloc
+from datetime import time
+from threading import Event
+from time import perf_counter
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .models import (
+    Class, ClassModuleAllocation, GenerationJob, Module, Room, Staff, Timetable, TimetableVersion
+)
+from .backtrack import BacktrackTimetableGenerator, _Frame, luby
+from .benchmark import compare_to_baseline
+from .conflicts import ConflictTracker, find_overlaps
+from .constraints import TimetableConstraints
+from . import feasibility
+from .feasibility import FeasibilityMatrix
+from .generator import TimeSlot, TimetableGenerator
+from .jobs import run_generation_job, start_generation_job
+from .localsearch import LocalSearch
+from . import parallel
+from .parallel import partition_allocations
+from .instance import (
+    AllocationRecord, ClassRecord, ModuleRecord, ProblemInstance, ProgramRecord, RoomRecord,
+    StaffRecord
+)
+from .repair import ChangeSet, IncrementalTimetableGenerator, StaffUnavailability
+from .resources import ResourceManager, RoomCatalogue
+from . import resultcache
+from .resultcache import fingerprint
+from .profiling import GenerationProfiler
+from .scoring import day_penalty
+from .slotgrid import SlotGrid, to_minutes
+from .solution import SolutionStore, minute_time
+from .synthetic import SyntheticConfig, build_institution
+
+
+def fail_first_portfolio_search(instance, academic_year, semester, seed, options):
+    """Stand-in portfolio search: seed 0 fails, the others wait to be stopped"""
+    if seed == 0:
+        raise RuntimeError('search failed')
+    parallel._stop_event.wait(30)
+    return None, {'status': 'stopped', 'nodes': 0, 'best_depth': 0, 'restarts': 0, 'backjumps': 0}
+
+
+WORKER_COUNTERS = {'slots_probed': 7, 'rooms_probed': 5, 'conflicts_detected': 0, 'conflicts_resolved': 0}
+
+
+def probe_only_partition(instance, allocation_ids, optimization_budget):
+    """Stand-in partition solve that places nothing and reports fixed counters"""
+    return SolutionStore(), list(allocation_ids), WORKER_COUNTERS
+
+
+def probe_only_start(instance, allocation_ids, seed, optimization_budget):
+    """Stand-in seeded run that places nothing and reports fixed counters"""
+    return SolutionStore(), list(allocation_ids), seed, WORKER_COUNTERS
+
 
 class ModuleModelTest(TestCase):
     def test_module_creation(self):
@@ -9,3 +70,1015 @@ class ModuleModelTest(TestCase):
             module_credit=10  # Test the new field
         )
         self.assertEqual(module.module_credit, 10)
+
+class ResourceManagerTest(SimpleTestCase):
+    def test_overlapping_booking_is_unavailable(self):
+        manager = ResourceManager()
+        manager.book(1, 1, 1, TimeSlot('Monday', time(8, 0), time(10, 0)))
+
+        self.assertFalse(manager.is_staff_available(1, TimeSlot('Monday', time(9, 30), time(11, 0))))
+        self.assertTrue(manager.is_staff_available(1, TimeSlot('Monday', time(10, 0), time(12, 0))))
+        self.assertTrue(manager.is_room_available(1, TimeSlot('Tuesday', time(8, 0), time(10, 0))))
+
+    def test_release_after_clash_keeps_remaining_booking(self):
+        manager = ResourceManager()
+        first = TimeSlot('Monday', time(8, 0), time(10, 0))
+        second = TimeSlot('Monday', time(9, 0), time(11, 0))
+        manager.book(1, 1, 1, first)
+        manager.book(1, 2, 2, second)
+        self.assertEqual(manager.clashing_staff(), [1])
+
+        manager.release(1, 2, 2, second)
+        self.assertEqual(manager.clashing_staff(), [])
+        self.assertFalse(manager.is_staff_available(1, first))
+
+
+class RoomCatalogueTest(SimpleTestCase):
+    def setUp(self):
+        self.catalogue = RoomCatalogue([
+            RoomRecord(0, 4, 'Lecture', 100), RoomRecord(1, 3, 'Lecture', 60),
+            RoomRecord(2, 2, 'Lecture', 60), RoomRecord(3, 1, 'Lecture', 30),
+            RoomRecord(4, 5, 'Laboratory', 40),
+        ])
+
+    def room_ids(self, rooms):
+        return [room.room_id for room in rooms]
+
+    def test_candidates_start_at_the_capacity_boundary(self):
+        self.assertEqual(self.room_ids(self.catalogue.candidates('Lecture', 0)), [1, 2, 3, 4])
+        self.assertEqual(self.room_ids(self.catalogue.candidates('Lecture', 30)), [1, 2, 3, 4])
+        self.assertEqual(self.room_ids(self.catalogue.candidates('Lecture', 31)), [2, 3, 4])
+        self.assertEqual(self.room_ids(self.catalogue.candidates('Lecture', 60)), [2, 3, 4])
+        self.assertEqual(self.room_ids(self.catalogue.candidates('Lecture', 100)), [4])
+        self.assertEqual(self.catalogue.candidates('Lecture', 101), [])
+
+    def test_unknown_room_type_has_no_rooms(self):
+        self.assertEqual(self.catalogue.candidates('Studio', 10), [])
+        self.assertIsNone(self.catalogue.find_free('Studio', 10, lambda room_id: True))
+
+    def test_find_free_picks_the_smallest_free_room(self):
+        self.assertEqual(self.catalogue.find_free('Lecture', 40, lambda room_id: True).room_id, 2)
+        self.assertEqual(self.catalogue.find_free('Lecture', 40, lambda room_id: room_id != 2).room_id, 3)
+        self.assertEqual(self.catalogue.find_free('Lecture', 40, lambda room_id: room_id == 4).room_id, 4)
+        self.assertIsNone(self.catalogue.find_free('Lecture', 40, lambda room_id: room_id == 1))
+        self.assertIsNone(self.catalogue.find_free('Laboratory', 41, lambda room_id: True))
+
+
+class SlotGridTest(SimpleTestCase):
+    def test_sessions_skip_break_starts(self):
+        grid = SlotGrid()
+        self.assertEqual(
+            grid.sessions('Any Program', 120),
+            [(480, 600), (690, 810), (870, 990)]
+        )
+        self.assertEqual(minute_time(690), time(11, 30))
+
+
+class ConflictTrackerTest(SimpleTestCase):
+    def test_only_touched_resources_are_rechecked(self):
+        manager = ResourceManager()
+        tracker = ConflictTracker(manager)
+        first = TimeSlot('Monday', time(8, 0), time(10, 0))
+        second = TimeSlot('Monday', time(9, 0), time(11, 0))
+        manager.book(1, 1, 1, first)
+        tracker.touch(1, 1, 1)
+        manager.book(1, 2, 2, second)
+        tracker.touch(1, 2, 2)
+
+        conflicts = tracker.conflicts()
+        self.assertEqual([c.conflict_type for c in conflicts], ['staff'])
+
+        manager.release(1, 2, 2, second)
+        tracker.touch(1, 2, 2)
+        self.assertEqual(tracker.conflicts(), [])
+
+
+class FindOverlapsTest(SimpleTestCase):
+    def test_reports_each_overlapping_pair_once(self):
+        pairs = find_overlaps([(1, 5, 'a'), (2, 3, 'b'), (3, 6, 'c'), (6, 7, 'd')])
+        self.assertEqual(pairs, [('a', 'b'), ('a', 'c')])
+
+
+class DayPenaltyTest(SimpleTestCase):
+    def test_awkward_gap_and_long_run_are_penalised(self):
+        self.assertEqual(day_penalty([(480, 600, 1), (690, 810, 1)]), 90)
+        self.assertEqual(day_penalty([(480, 600, 1), (600, 720, 1), (720, 840, 1)]), 120)
+        self.assertEqual(day_penalty([(480, 600, 1), (870, 990, 2)]), 0)
+
+    def test_back_to_back_room_change_is_penalised(self):
+        self.assertEqual(day_penalty([(480, 600, 1), (600, 720, 2)]), 15)
+
+
+class SyntheticInstitutionTest(TestCase):
+    def test_builds_configured_shape(self):
+        config = SyntheticConfig(
+            departments=2, programs_per_department=1, classes_per_program=2,
+            streams_per_class=2, staff_per_department=3, rooms=5, modules_per_class=3
+        )
+        counts = build_institution(config)
+        self.assertEqual(counts['classes'], 8)
+        self.assertEqual(counts['allocations'], 24)
+        self.assertEqual(ClassModuleAllocation.objects.count(), 24)
+
+    def test_every_allocation_has_a_room(self):
+        for size in ('small', 'medium'):
+            with self.subTest(size=size):
+                config = SyntheticConfig.preset(size)
+                config.academic_year = size
+                build_institution(config)
+                instance = ProblemInstance.load(config.academic_year, config.semester)
+                catalogue = RoomCatalogue(instance.rooms)
+                homeless = [
+                    allocation.allocation_id for allocation in instance.allocations
+                    if not catalogue.candidates(
+                        allocation.module_id.module_type, allocation.class_id.class_capacity
+                    )
+                ]
+                self.assertEqual(homeless, [])
+
+
+class ProblemInstanceTest(TestCase):
+    def test_loads_in_fixed_number_of_queries(self):
+        build_institution(SyntheticConfig(departments=2, rooms=6))
+        with self.assertNumQueries(7):
+            instance = ProblemInstance.load()
+
+        allocation = instance.allocations[0]
+        row = ClassModuleAllocation.objects.get(allocation_id=allocation.allocation_id)
+        self.assertEqual(allocation.module_id.module_type, row.module_id.module_type)
+        self.assertEqual(allocation.class_id.class_capacity, row.class_id.class_capacity)
+        self.assertIs(instance.allocation(allocation.allocation_id), allocation)
+
+
+class CompareToBaselineTest(SimpleTestCase):
+    def test_flags_slower_runs_and_more_queries(self):
+        baseline = {'results': [{'size': 'small', 'runs': [
+            {'generator': 'greedy', 'runtime': 1.0, 'queries': 10, 'unscheduled': 0}
+        ]}]}
+        current = {'results': [{'size': 'small', 'runs': [
+            {'generator': 'greedy', 'runtime': 1.5, 'queries': 12, 'unscheduled': 0}
+        ]}]}
+        self.assertEqual(len(compare_to_baseline(current, baseline)), 2)
+        self.assertEqual(compare_to_baseline(baseline, baseline), [])
+
+
+class SolutionStoreTest(SimpleTestCase):
+    def test_slots_round_trip_through_columns(self):
+        slot = TimeSlot('Tuesday', time(11, 30), time(13, 30))
+        self.assertEqual((slot.day_index, slot.start_minute, slot.end_minute), (1, 690, 810))
+        self.assertIs(slot.start_time, TimeSlot.from_minutes(3, 690, 750).start_time)
+        self.assertEqual(slot.key, TimeSlot.from_minutes(1, 690, 810).key)
+
+        store = SolutionStore()
+        store.append(4, slot.day_index, slot.start_minute, slot.end_minute, 2)
+        self.assertEqual(list(store), [(4, 1, 690, 810, 2)])
+
+
+class FeasibilityMatrixTest(SimpleTestCase):
+    def test_rows_combine_lattice_and_room_fit(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        lecture = ModuleRecord(0, 1, 'Lecture', 10, 1)
+        lab = ModuleRecord(1, 2, 'Laboratory', 10, 1)
+        small = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        allocations = [
+            AllocationRecord(0, 1, small, lecture, None, program),
+            AllocationRecord(1, 2, small, lab, None, program),
+        ]
+        rooms = RoomCatalogue([RoomRecord(0, 1, 'Lecture', 60)])
+
+        # The NumPy build and the column-list fallback give the same rows
+        for np in (feasibility.np, None):
+            with self.subTest(numpy=np is not None), mock.patch.object(feasibility, 'np', np):
+                matrix = FeasibilityMatrix(allocations, rooms, SlotGrid(), lambda allocation: 120)
+                self.assertEqual(matrix.matrix is not None, np is not None)
+                self.assertEqual(matrix.sessions(allocations[0]), [(480, 600), (690, 810), (870, 990)])
+                self.assertEqual(matrix.sessions(allocations[1]), [])
+
+
+class FingerprintTest(SimpleTestCase):
+    def make_instance(self, capacity):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        module = ModuleRecord(0, 1, 'Lecture', 10, 1)
+        group = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        teacher = StaffRecord(0, 1, 1)
+        return ProblemInstance(
+            [program], [module], [RoomRecord(0, 1, 'Lecture', capacity)], [teacher], [group],
+            [AllocationRecord(0, 1, group, module, teacher, program)], [[]]
+        )
+
+    def test_changes_only_with_inputs(self):
+        parameters = {'seed': 1, 'starts': None}
+        self.assertEqual(
+            fingerprint(self.make_instance(60), parameters),
+            fingerprint(self.make_instance(60), dict(parameters))
+        )
+        self.assertNotEqual(
+            fingerprint(self.make_instance(60), parameters),
+            fingerprint(self.make_instance(80), parameters)
+        )
+        self.assertNotEqual(
+            fingerprint(self.make_instance(60), parameters),
+            fingerprint(self.make_instance(60), {'seed': 2, 'starts': None})
+        )
+
+
+class ResultCacheTest(TestCase):
+    @override_settings(TIMETABLE_RESULT_CACHE_ENTRIES=2)
+    def test_oldest_results_are_evicted(self):
+        for key in ('a', 'b', 'c'):
+            resultcache.store_result(key, SolutionStore(), [1])
+        self.assertIsNone(resultcache.get_result('a'))
+        self.assertEqual(resultcache.get_result('c')[1], [1])
+        self.assertEqual(resultcache.invalidate(), 2)
+        self.assertIsNone(resultcache.get_result('c'))
+
+    def test_result_is_not_stored_while_index_is_locked(self):
+        self.assertTrue(cache.add(resultcache.LOCK_KEY, True))
+        with mock.patch.object(resultcache, 'LOCK_WAIT', 0):
+            resultcache.store_result('a', SolutionStore(), [])
+        self.assertIsNone(resultcache.get_result('a'))
+        cache.delete(resultcache.LOCK_KEY)
+
+        resultcache.store_result('a', SolutionStore(), [])
+        self.assertIsNotNone(resultcache.get_result('a'))
+        self.assertIsNone(cache.get(resultcache.LOCK_KEY))
+
+    def test_backend_errors_count_as_misses(self):
+        with mock.patch.object(cache, 'get', side_effect=DatabaseError('no such table')):
+            self.assertIsNone(resultcache.get_result('a'))
+        with mock.patch.object(cache, 'add', side_effect=DatabaseError('no such table')):
+            resultcache.store_result('a', SolutionStore(), [])
+        self.assertIsNone(resultcache.get_result('a'))
+
+        build_institution(SyntheticConfig(departments=1, rooms=8))
+        generator = TimetableGenerator(seed=0, optimization_budget=0.1, use_cache=True)
+        with mock.patch.object(cache, 'get', side_effect=DatabaseError('no such table')), \
+                mock.patch.object(cache, 'add', side_effect=DatabaseError('no such table')):
+            generator.generate_timetable()
+        self.assertTrue(generator.version.is_active)
+
+    def test_per_process_cache_is_not_used(self):
+        self.assertTrue(resultcache.available())
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        }):
+            self.assertFalse(resultcache.available())
+
+    def test_only_validated_results_are_stored(self):
+        build_institution(SyntheticConfig(departments=1, rooms=8))
+        generator = TimetableGenerator(seed=0, optimization_budget=0.1, use_cache=True)
+        with mock.patch.object(TimetableGenerator, '_validate_final_schedule', return_value=False):
+            with self.assertRaises(ValueError):
+                generator.generate_timetable()
+        self.assertEqual(cache.get(resultcache.INDEX_KEY, []), [])
+
+        generator = TimetableGenerator(seed=0, optimization_budget=0.1, use_cache=True)
+        generator.generate_timetable()
+        self.assertEqual(len(cache.get(resultcache.INDEX_KEY)), 1)
+        self.assertFalse(generator.cache_hit)
+
+
+class GenerationProfilerTest(TestCase):
+    def test_phases_record_time_queries_counters_and_memory(self):
+        profiler = GenerationProfiler()
+        with profiler.phase('load'):
+            Module.objects.count()
+            profiler.slots_probed += 3
+            # The heap is only traced on request
+            self.assertFalse(tracemalloc.is_tracing())
+
+        load, = profiler.phases
+        self.assertEqual((load['phase'], load['queries'], load['slots_probed']), ('load', 1, 3))
+        self.assertGreaterEqual(load['wall_time'], 0)
+        self.assertIn('rss_delta_kb', load)
+        self.assertNotIn('peak_memory_kb', load)
+        self.assertEqual(profiler.report()['totals']['slots_probed'], 3)
+
+    def test_traced_peaks_are_per_phase(self):
+        profiler = GenerationProfiler(trace_memory=True)
+        with profiler.phase('load'):
+            buffer = bytearray(2 * 1024 * 1024)
+        del buffer
+        with profiler.phase('idle'):
+            pass
+
+        load, idle = profiler.phases
+        self.assertGreaterEqual(load['peak_memory_kb'], 2048)
+        # Peaks are per phase, not for the life of the process
+        self.assertLess(idle['peak_memory_kb'], 1024)
+        self.assertEqual(profiler.report()['totals']['peak_memory_kb'], load['peak_memory_kb'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_worker_counters_are_merged(self):
+        build_institution(SyntheticConfig(departments=2, rooms=8))
+        generator = TimetableGenerator(optimization_budget=0.1, publish=False)
+        generator._prepare_allocations()
+        with mock.patch('timetablegen.generator.solve_partition', probe_only_partition), \
+                mock.patch('timetablegen.generator.solve_seeded', probe_only_start):
+            with generator.profiler.phase('partitioned'):
+                generator._generate_partitioned(2)
+            with generator.profiler.phase('multistart'):
+                generator._generate_multistart(3, 2)
+
+        partitioned, multistart = generator.profiler.phases
+        self.assertEqual((partitioned['slots_probed'], partitioned['rooms_probed']), (14, 10))
+        self.assertEqual((multistart['slots_probed'], multistart['rooms_probed']), (21, 15))
+
+
+class ForwardCheckingBacktrackTest(SimpleTestCase):
+    def make_instance(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        group = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        # One teacher fills 45 of the 50 weekly slots
+        busy_teacher, other_teacher = StaffRecord(0, 1, 1), StaffRecord(1, 2, 1)
+        modules = [ModuleRecord(index, index, 'Lecture', 10, 1) for index in range(60)]
+        return ProblemInstance(
+            [program], modules, [RoomRecord(0, 1, 'Lecture', 60), RoomRecord(1, 2, 'Lecture', 60)],
+            [busy_teacher, other_teacher], [group],
+            [
+                AllocationRecord(
+                    index, index, group, module,
+                    busy_teacher if index < 45 else other_teacher, program
+                )
+                for index, module in enumerate(modules)
+            ],
+            [[], []]
+        )
+
+    def test_places_every_allocation_without_clashes(self):
+        timetable = BacktrackTimetableGenerator(
+            '2025/2026', 1, instance=self.make_instance(), seed=0
+        ).generate()
+        self.assertEqual(len(timetable), 60)
+        busy = [(entry['staff_id'].staff_id, entry['day_of_week'], entry['start_time']) for entry in timetable]
+        self.assertEqual(len(busy), len(set(busy)))
+        rooms = [(entry['room_id'].room_id, entry['day_of_week'], entry['start_time']) for entry in timetable]
+        self.assertEqual(len(rooms), len(set(rooms)))
+
+    def test_node_limit_stops_search(self):
+        generator = BacktrackTimetableGenerator(
+            '2025/2026', 1, instance=self.make_instance(), seed=0, node_limit=10
+        )
+        self.assertIsNone(generator.generate())
+        self.assertEqual(generator.status, 'node_limit')
+        self.assertEqual(generator.progress()['nodes'], 10)
+        self.assertEqual(generator.timetable, [])
+
+    def test_preference_weights_come_from_the_index(self):
+        instance = self.make_instance()
+        instance.preferences[0] = [('Monday', 480, 600, 2), ('Tuesday', 540, 720, 5)]
+        generator = BacktrackTimetableGenerator('2025/2026', 1, instance=instance)
+
+        weights = generator._get_slot_weights(0)
+        self.assertEqual(weights[:3], [2, 2, 0])
+        self.assertEqual(weights[10:14], [0, 5, 5, 5])
+        slots = generator._get_available_slots(instance.staff[0])
+        self.assertEqual([slot['weight'] for slot in slots[:5]], [5, 5, 5, 2, 2])
+        self.assertIs(generator._get_slot_weights(0), weights)
+
+    def test_unplaceable_allocation_proves_infeasible(self):
+        instance = self.make_instance()
+        instance.modules[59].module_type = 'Laboratory'
+        generator = BacktrackTimetableGenerator('2025/2026', 1, instance=instance, seed=0)
+        self.assertIsNone(generator.generate())
+        self.assertEqual(generator.status, 'infeasible')
+        self.assertEqual(generator.nodes, 0)
+
+    def test_nogoods_block_their_last_assignment(self):
+        generator = BacktrackTimetableGenerator(
+            '2025/2026', 1, instance=self.make_instance(), nogood_limit=1
+        )
+        generator._init_domains()
+        generator.values[3], generator.values[7] = (0, 1), (4, 0)
+        stack = [_Frame(3, [], 0), _Frame(7, [], 0)]
+        generator._record_nogood({3, 7}, stack)
+        self.assertEqual(generator.nogoods[(3, 0, 1), (7, 4, 0)][:2], [(7, 4, 0), (3, 0, 1)])
+        self.assertEqual(generator._nogood_conflict(7, 4, 0), {3})
+        self.assertIsNone(generator._nogood_conflict(7, 5, 0))
+
+        # Past the limit the oldest nogood is forgotten
+        generator._record_nogood({7}, stack)
+        self.assertEqual(list(generator.nogoods), [((7, 4, 0),)])
+        self.assertIsNone(generator._nogood_conflict(3, 0, 1))
+        self.assertEqual(generator._nogood_conflict(7, 4, 0), set())
+
+    def test_nogood_store_stays_bounded_on_infeasible_instance(self):
+        # Eleven one-teacher lectures for ten slots: a long exhausting search
+        # fills the store, which must evict without leaving stale watches
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        groups = [ClassRecord(index, index + 1, 40, 'A', '2025/2026', program) for index in range(2)]
+        teacher = StaffRecord(0, 1, 1)
+        modules = [ModuleRecord(index, index, 'Lecture', 10, 1) for index in range(11)]
+        instance = ProblemInstance(
+            [program], modules, [RoomRecord(0, 1, 'Lecture', 60), RoomRecord(1, 2, 'Lecture', 60)],
+            [teacher], groups,
+            [
+                AllocationRecord(index, index, groups[index % 2], module, teacher, program)
+                for index, module in enumerate(modules)
+            ],
+            [[]]
+        )
+        time_slots = BacktrackTimetableGenerator._generate_time_slots
+        with mock.patch.object(
+            BacktrackTimetableGenerator, '_generate_time_slots',
+            lambda generator: time_slots(generator)[:2]
+        ):
+            generator = BacktrackTimetableGenerator(
+                '2025/2026', 1, instance=instance, seed=0, nogood_limit=50, node_limit=5000
+            )
+            generator.generate()
+        self.assertEqual(generator.status, 'node_limit')
+        self.assertEqual(len(generator.nogoods), 50)
+
+        watched = [key for keys in generator.nogood_watch.values() for key in keys]
+        self.assertEqual(set(watched), set(generator.nogoods))
+        self.assertEqual(
+            len(watched), sum(min(len(literals), 2) for literals in generator.nogoods.values())
+        )
+
+    def test_stop_event_cancels_search(self):
+        stop_event = Event()
+        stop_event.set()
+        generator = BacktrackTimetableGenerator(
+            '2025/2026', 1, instance=self.make_instance(), stop_event=stop_event
+        )
+        self.assertIsNone(generator.generate())
+        self.assertEqual(generator.status, 'cancelled')
+
+    def test_failed_portfolio_search_stops_the_others(self):
+        generator = BacktrackTimetableGenerator(
+            '2025/2026', 1, instance=self.make_instance(), seed=0
+        )
+        started = perf_counter()
+        with mock.patch('timetablegen.backtrack.solve_backtrack', fail_first_portfolio_search):
+            with self.assertRaisesMessage(RuntimeError, 'search failed'):
+                generator.generate(workers=2)
+        self.assertLess(perf_counter() - started, 15)
+
+    def test_placements_round_trip(self):
+        instance = self.make_instance()
+        solved = BacktrackTimetableGenerator('2025/2026', 1, instance=instance, seed=1)
+        solved.generate()
+        copy = BacktrackTimetableGenerator('2025/2026', 1, instance=instance)
+        copy._import_placements(solved.export_placements())
+        self.assertEqual(copy.timetable, solved.timetable)
+
+    def test_luby_sequence(self):
+        self.assertEqual(
+            [luby(index) for index in range(1, 16)],
+            [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+        )
+
+
+class BacktrackOccupancyTest(SimpleTestCase):
+    def test_index_follows_add_and_undo(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        other_program = ProgramRecord(1, 2, 'Certificate', '4', 2)
+        group = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        teacher = StaffRecord(0, 1, 1)
+        module = ModuleRecord(0, 1, 'Lecture', 10, 1)
+        room = RoomRecord(0, 1, 'Lecture', 60)
+        first = AllocationRecord(0, 1, group, module, teacher, program)
+        second = AllocationRecord(1, 2, group, module, StaffRecord(1, 2, 2), other_program)
+        generator = BacktrackTimetableGenerator(
+            '2025/2026', 1, forward_checking=False,
+            instance=ProblemInstance([program], [module], [room], [teacher], [group], [first], [[]])
+        )
+        monday_8, monday_9 = generator.week_slots[0], generator.week_slots[1]
+
+        generator._add_to_timetable(first, room, monday_8)
+        self.assertFalse(generator._is_valid_assignment(first, teacher, room, monday_8))
+        # Another department may not follow straight on in the same room
+        self.assertFalse(generator._is_valid_assignment(second, second.staff_id, room, monday_9))
+        self.assertTrue(generator._is_valid_assignment(first, teacher, room, monday_9))
+
+        generator._remove_last_entry()
+        self.assertTrue(generator._is_valid_assignment(first, teacher, room, monday_8))
+        self.assertTrue(generator._is_valid_assignment(second, second.staff_id, room, monday_9))
+
+    def test_suitable_rooms_cached_in_seeded_order(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        group = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        teacher = StaffRecord(0, 1, 1)
+        module = ModuleRecord(0, 1, 'Lecture', 10, 1)
+        rooms = [RoomRecord(index, index + 1, 'Lecture', 30 + 10 * index) for index in range(8)]
+        rooms.append(RoomRecord(8, 9, 'Lab', 100))
+        allocation = AllocationRecord(0, 1, group, module, teacher, program)
+        instance = ProblemInstance([program], [module], rooms, [teacher], [group], [allocation], [[]])
+
+        orders = []
+        for _ in range(2):
+            generator = BacktrackTimetableGenerator('2025/2026', 1, instance=instance, seed=3)
+            suitable = generator._get_suitable_rooms(allocation)
+            self.assertIs(generator._get_suitable_rooms(allocation), suitable)
+            orders.append([room.room_id for room in suitable])
+        self.assertEqual(orders[0], orders[1])
+        self.assertEqual(sorted(orders[0]), [2, 3, 4, 5, 6, 7, 8])
+
+
+class AllocationRegistryTest(TestCase):
+    def test_equal_priorities_queue_by_allocation_id(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        module = ModuleRecord(0, 1, 'Lecture', 10, 1)
+        teacher = StaffRecord(0, 1, 1)
+        groups = [ClassRecord(index, index + 1, 40, 'A', '2025/2026', program) for index in range(3)]
+        allocations = [
+            AllocationRecord(index, allocation_id, groups[index], module, teacher, program)
+            for index, allocation_id in enumerate((30, 10, 20))
+        ]
+        generator = TimetableGenerator(
+            instance=ProblemInstance([program], [module], [], [teacher], groups, allocations, [[]])
+        )
+        generator._prepare_allocations()
+
+        self.assertEqual(sorted(generator.allocations), [10, 20, 30])
+        self.assertIs(generator.allocations[20], allocations[2])
+        popped = [heapq.heappop(generator.pending_allocations)[2].allocation_id for _ in range(3)]
+        self.assertEqual(popped, [10, 20, 30])
+
+        # No room fits, so all three fail with equal priority and are retried
+        generator._load_allocations(allocations)
+        generator._generate_initial_schedule()
+        generator._handle_failed_allocations()
+        self.assertEqual(len(generator.failed_allocations), 3)
+
+    def test_validation_and_save_do_not_query_per_allocation(self):
+        build_institution(SyntheticConfig(departments=1, rooms=8))
+        generator = TimetableGenerator(seed=0, optimization_budget=0)
+        generator._prepare_allocations()
+        generator._generate_initial_schedule()
+        self.assertGreater(len(generator.slot_allocations), 10)
+
+        with self.assertNumQueries(0):
+            generator._validate_final_schedule()
+        with CaptureQueriesContext(connection) as queries:
+            generator._save_timetable()
+        self.assertLess(len(queries), 10)
+
+
+    def test_backtracked_rows_keep_their_allocation(self):
+        build_institution(SyntheticConfig(departments=1, rooms=8, modules_per_class=1))
+        generator = BacktrackTimetableGenerator('2025/2026', 1, seed=0)
+        self.assertIsNotNone(generator.generate())
+        generator.save_timetable()
+        self.assertTrue(Timetable.objects.active().exists())
+        self.assertFalse(Timetable.objects.active().filter(allocation=None).exists())
+
+class GenerationJobTest(TestCase):
+    def test_run_reaches_done_and_publishes(self):
+        build_institution(SyntheticConfig(departments=1, rooms=8))
+        job = GenerationJob.objects.create(parameters={'optimization_budget': 0.1})
+
+        run_generation_job(job.job_id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.progress, 1.0)
+        self.assertTrue(job.version.is_active)
+        self.assertEqual(Timetable.objects.active().count(), job.version.entries.count())
+        self.assertIn('validate', [phase['phase'] for phase in job.profile['phases']])
+
+    def test_failed_run_is_recorded(self):
+        job = GenerationJob.objects.create()
+        with mock.patch.object(
+            TimetableGenerator, 'generate_timetable', side_effect=ValueError('no rooms')
+        ):
+            run_generation_job(job.job_id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'no rooms')
+        self.assertIsNotNone(job.finished_at)
+
+
+@override_settings(TIMETABLE_JOB_BACKEND='celery')
+class GenerationJobApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner'))
+
+    def test_submit_queues_job_and_returns_its_id(self):
+        with mock.patch('timetablegen.tasks.run_generation_job_task.delay') as delay:
+            response = self.client.post('/api/timetables/generate/')
+
+        self.assertEqual(response.status_code, 202)
+        job = GenerationJob.objects.get(job_id=response.data['job_id'])
+        delay.assert_called_once_with(job.job_id)
+        self.assertEqual(job.status, 'queued')
+
+    def test_status_can_be_polled(self):
+        job = GenerationJob.objects.create()
+        self.assertEqual(self.client.get(f'/api/generation-jobs/{job.job_id}/').data['status'], 'queued')
+
+        GenerationJob.objects.filter(job_id=job.job_id).update(
+            status='running', phase='optimize', progress=0.3
+        )
+        response = self.client.get(f'/api/generation-jobs/{job.job_id}/')
+        self.assertEqual(
+            (response.data['status'], response.data['phase'], response.data['progress']),
+            ('running', 'optimize', 0.3)
+        )
+
+    def test_unreachable_broker_fails_the_job(self):
+        with mock.patch(
+            'timetablegen.tasks.run_generation_job_task.delay',
+            side_effect=ConnectionError('broker down')
+        ):
+            response = self.client.post('/api/timetables/generate/')
+            with self.assertRaises(ConnectionError):
+                start_generation_job()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(GenerationJob.objects.filter(status='queued').count(), 0)
+        job = GenerationJob.objects.first()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('broker down', job.error)
+
+
+class TimetableVersionTest(TestCase):
+    def setUp(self):
+        build_institution(SyntheticConfig(departments=1, rooms=2))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner'))
+
+    def add_entry(self, version, day='Monday'):
+        return Timetable.objects.create(
+            version=version, module_id=Module.objects.first(), room_id=Room.objects.first(),
+            staff_id=Staff.objects.first(), class_id=Class.objects.first(), class_stream='A',
+            day_of_week=day, start_time=time(8, 0), end_time=time(9, 0), semester=1
+        )
+
+    def entry_payload(self):
+        return {
+            'module_id': Module.objects.first().pk, 'room_id': Room.objects.first().pk,
+            'staff_id': Staff.objects.first().pk, 'class_id': Class.objects.first().pk,
+            'class_stream': 'A', 'day_of_week': 'Tuesday', 'start_time': '10:00',
+            'end_time': '11:00', 'semester': 1
+        }
+
+    def test_publish_switches_the_active_version(self):
+        first, second = TimetableVersion.objects.create(), TimetableVersion.objects.create()
+        first.publish()
+        second.publish()
+        first.refresh_from_db()
+        self.assertFalse(first.is_active)
+        self.assertEqual(TimetableVersion.active(), second)
+        self.assertIsNotNone(second.published_at)
+
+    def test_prune_keeps_active_and_newest_versions(self):
+        versions = [TimetableVersion.objects.create(label=str(index)) for index in range(4)]
+        versions[0].publish()
+        self.assertEqual(TimetableVersion.prune(keep=1), 2)
+        self.assertEqual(
+            set(TimetableVersion.objects.values_list('label', flat=True)), {'0', '3'}
+        )
+
+    def test_only_active_entries_are_served(self):
+        draft, published = TimetableVersion.objects.create(), TimetableVersion.objects.create()
+        self.add_entry(draft)
+        entry = self.add_entry(published, day='Friday')
+        published.publish()
+        self.assertEqual(list(Timetable.objects.active()), [entry])
+        response = self.client.get('/api/timetables/')
+        self.assertEqual([row['timetable_id'] for row in response.data], [entry.timetable_id])
+
+    def test_api_writes_go_to_the_active_version(self):
+        draft, published = TimetableVersion.objects.create(), TimetableVersion.objects.create()
+        published.publish()
+        payload = dict(self.entry_payload(), version=draft.pk)
+        response = self.client.post('/api/timetables/', payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Timetable.objects.get(pk=response.data['timetable_id']).version, published)
+
+        entry = self.add_entry(published)
+        response = self.client.patch(f'/api/timetables/{entry.pk}/', {'day_of_week': 'Wednesday'})
+        self.assertEqual(response.status_code, 200)
+        entry.refresh_from_db()
+        self.assertEqual((entry.version, entry.day_of_week), (published, 'Wednesday'))
+
+    def test_api_write_without_published_version_is_rejected(self):
+        response = self.client.post('/api/timetables/', self.entry_payload())
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/timetables/bulk_update/', [self.entry_payload()], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Timetable.objects.exists())
+
+
+class IncrementalRepairTest(TestCase):
+    def setUp(self):
+        build_institution(SyntheticConfig(departments=1, rooms=8))
+        TimetableGenerator(seed=0, optimization_budget=0.1).generate_timetable()
+        self.before = self.placements()
+
+    def placements(self):
+        """Active rows by id, as (allocation, room, day, start)"""
+        return {
+            entry.timetable_id: (entry.allocation_id, entry.room_id_id, entry.day_of_week, entry.start_time)
+            for entry in Timetable.objects.active()
+        }
+
+    def repair(self, **changes):
+        return IncrementalTimetableGenerator(seed=0).repair(ChangeSet(**changes))
+
+    def assert_untouched_kept(self, moved_ids):
+        after = self.placements()
+        kept = {timetable_id for timetable_id in self.before if timetable_id not in moved_ids}
+        self.assertTrue(kept)
+        self.assertEqual({timetable_id: after[timetable_id] for timetable_id in kept},
+                         {timetable_id: self.before[timetable_id] for timetable_id in kept})
+
+    def test_unavailable_staff_is_moved_off_the_day(self):
+        entry = Timetable.objects.active().first()
+        hit = set(Timetable.objects.active().filter(
+            staff_id=entry.staff_id, day_of_week=entry.day_of_week
+        ).values_list('timetable_id', flat=True))
+
+        result = self.repair(unavailable_staff=[StaffUnavailability(entry.staff_id_id, entry.day_of_week)])
+
+        self.assertFalse(Timetable.objects.active().filter(
+            staff_id=entry.staff_id, day_of_week=entry.day_of_week
+        ).exists())
+        self.assertGreaterEqual(result['removed'], len(hit))
+        self.assert_untouched_kept(hit)
+
+    def test_offline_room_is_emptied(self):
+        entry = Timetable.objects.active().first()
+        hit = set(Timetable.objects.active().filter(room_id=entry.room_id).values_list('timetable_id', flat=True))
+
+        self.repair(offline_rooms=[entry.room_id_id])
+
+        self.assertFalse(Timetable.objects.active().filter(room_id=entry.room_id).exists())
+        self.assert_untouched_kept(hit)
+
+    def test_removed_allocation_loses_its_rows(self):
+        entry = Timetable.objects.active().first()
+        hit = set(Timetable.objects.active().filter(
+            allocation_id=entry.allocation_id
+        ).values_list('timetable_id', flat=True))
+
+        result = self.repair(removed_allocations=[entry.allocation_id])
+
+        self.assertEqual(result['removed'], len(hit))
+        self.assertEqual(result['added'], 0)
+        self.assertFalse(Timetable.objects.active().filter(allocation_id=entry.allocation_id).exists())
+        self.assert_untouched_kept(hit)
+
+    def test_added_allocation_is_placed(self):
+        template = ClassModuleAllocation.objects.first()
+        module = Module.objects.exclude(
+            module_id__in=ClassModuleAllocation.objects.filter(
+                class_id=template.class_id
+            ).values('module_id')
+        ).filter(module_type='Lecture', semester=1).first()
+        allocation = ClassModuleAllocation.objects.create(
+            class_id=template.class_id, module_id=module,
+            staff_id=template.staff_id, program_id=template.program_id
+        )
+
+        result = self.repair(added_allocations=[allocation.allocation_id])
+
+        self.assertNotIn(allocation.allocation_id, result['unscheduled'])
+        self.assertTrue(Timetable.objects.active().filter(allocation=allocation).exists())
+        self.assertEqual(result['removed'], 0)
+        self.assert_untouched_kept(set())
+
+    def test_rows_are_matched_to_their_allocation(self):
+        # Rows saved before entries kept their allocation fall back to the key
+        Timetable.objects.filter(timetable_id=min(self.before)).update(allocation=None)
+        generator = IncrementalTimetableGenerator(seed=0)
+        generator.version = TimetableVersion.active()
+        generator._prepare_allocations()
+        self.assertEqual(generator._load_current_timetable(ChangeSet()), [])
+        self.assertEqual(len(generator.loaded_entries), len(self.before))
+        for slot, entry in generator.loaded_entries.items():
+            self.assertEqual(
+                generator.slot_allocations[slot].allocation_id, self.before[entry.timetable_id][0]
+            )
+
+    def test_split_session_is_replaced_as_a_whole(self):
+        entry = Timetable.objects.active().first()
+        allocation_rows = Timetable.objects.active().filter(allocation_id=entry.allocation_id)
+        minutes = lambda rows: sum(to_minutes(row.end_time) - to_minutes(row.start_time) for row in rows)
+        expected = minutes(allocation_rows)
+
+        # Store the entry as two halves and make only the first one unavailable
+        unit = TimetableConstraints.SLOT_MINUTES
+        start, end = to_minutes(entry.start_time), to_minutes(entry.end_time)
+        middle = start + (end - start) // 2 // unit * unit
+        Timetable.objects.filter(timetable_id=entry.timetable_id).update(end_time=minute_time(middle))
+        entry.pk = None
+        entry.start_time = minute_time(middle)
+        entry.save()
+
+        result = self.repair(unavailable_staff=[StaffUnavailability(
+            entry.staff_id_id, entry.day_of_week, minute_time(start), minute_time(middle)
+        )])
+
+        self.assertNotIn(entry.allocation_id, result['unscheduled'])
+        self.assertEqual(minutes(allocation_rows.all()), expected)
+
+    def test_conflicts_given_up_are_placed_again(self):
+        # Two entries overlapping in one room
+        first, second = Timetable.objects.active().order_by('timetable_id')[:2]
+        start = to_minutes(first.start_time) + TimetableConstraints.SLOT_MINUTES
+        Timetable.objects.filter(timetable_id=second.timetable_id).update(
+            room_id=first.room_id, day_of_week=first.day_of_week, start_time=minute_time(start),
+            end_time=minute_time(start + to_minutes(second.end_time) - to_minutes(second.start_time))
+        )
+
+        with mock.patch.object(IncrementalTimetableGenerator, '_resolve_single_conflict', return_value=False):
+            result = self.repair()
+
+        self.assertEqual(len(result['unscheduled']), len(set(result['unscheduled'])))
+        for allocation_id in (first.allocation_id, second.allocation_id):
+            placed = Timetable.objects.active().filter(allocation_id=allocation_id).exists()
+            self.assertEqual(placed, allocation_id not in result['unscheduled'])
+            self.assertTrue(placed)
+
+    def test_other_years_keep_their_rooms_busy(self):
+        entry = Timetable.objects.active().first()
+        generator = IncrementalTimetableGenerator(academic_year='2024/2025', seed=0)
+        self.assertEqual(generator.allocations, {})
+        generator.repair(ChangeSet())
+
+        slot = TimeSlot(entry.day_of_week, entry.start_time, entry.end_time)
+        self.assertFalse(generator.resource_manager.is_room_available(entry.room_id_id, slot))
+        self.assertEqual(self.placements(), self.before)
+
+    def test_repair_runs_as_a_job(self):
+        room_id = Timetable.objects.active().first().room_id_id
+        with override_settings(TIMETABLE_JOB_BACKEND='celery'), \
+                mock.patch('timetablegen.tasks.run_generation_job_task.delay') as delay:
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user('planner'))
+            response = client.post('/api/timetables/repair/', {'offline_rooms': [room_id]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        delay.assert_called_once_with(job_id)
+
+        run_generation_job(job_id)
+
+        job = GenerationJob.objects.get(job_id=job_id)
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.version, TimetableVersion.active())
+        self.assertGreater(job.result['removed'], 0)
+        self.assertFalse(Timetable.objects.active().filter(room_id=room_id).exists())
+
+
+class RelaxedPlacementTest(SimpleTestCase):
+    def test_failed_allocation_falls_back_to_another_room_type(self):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        seminar = ModuleRecord(0, 1, 'Seminar', 10, 1)
+        group = ClassRecord(0, 1, 40, 'A', '2025/2026', program)
+        teacher = StaffRecord(0, 1, 1)
+        instance = ProblemInstance(
+            [program], [seminar], [RoomRecord(0, 1, 'Lecture', 60)], [teacher], [group],
+            [AllocationRecord(0, 1, group, seminar, teacher, program)], [[]]
+        )
+        generator = TimetableGenerator(instance=instance)
+        generator._prepare_allocations()
+        generator._generate_initial_schedule()
+        self.assertEqual(len(generator.failed_allocations), 1)
+
+        generator._handle_failed_allocations()
+        self.assertEqual(generator.failed_allocations, [])
+        self.assertEqual([room.room_type for room in generator.slot_rooms.values()], ['Lecture'])
+        self.assertTrue(generator._validate_final_schedule())
+
+
+class LocalSearchTest(SimpleTestCase):
+    def make_generator(self, count=6):
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        modules = [ModuleRecord(index, index + 1, 'Lecture', 10, 1) for index in range(count)]
+        groups = [ClassRecord(index, index + 1, 40, 'A', '2025/2026', program) for index in range(2)]
+        staff = [StaffRecord(index, index + 1, 1) for index in range(2)]
+        instance = ProblemInstance(
+            [program], modules, [RoomRecord(index, index + 1, 'Lecture', 60) for index in range(2)],
+            staff, groups,
+            [
+                AllocationRecord(index, index + 1, groups[index % 2], module, staff[index % 2], program)
+                for index, module in enumerate(modules)
+            ],
+            [[], []]
+        )
+        generator = TimetableGenerator(instance=instance, seed=0)
+        generator._prepare_allocations()
+        generator._generate_initial_schedule()
+        return generator
+
+    def test_placed_slots_follow_place_and_unplace(self):
+        generator = self.make_generator()
+        LocalSearch(generator, time_budget=0.05, rng=random.Random(0)).run()
+        generator._unplace(generator.placed_slots[0])
+
+        self.assertCountEqual(generator.placed_slots, generator.slot_allocations)
+        self.assertEqual(
+            generator.slot_positions,
+            {slot: position for position, slot in enumerate(generator.placed_slots)}
+        )
+
+    def test_stops_at_zero_penalty(self):
+        search = LocalSearch(self.make_generator(count=1), time_budget=30, rng=random.Random(0))
+        self.assertEqual(search.run(), 0)
+        self.assertEqual(search.iterations, 0)
+
+    def test_tabu_leaves_an_allocation_free_to_move(self):
+        generator = self.make_generator(count=3)
+        search = LocalSearch(generator, time_budget=0, rng=random.Random(0), tabu_tenure=10)
+        search.run()
+        self.assertEqual(search.tabu.maxlen, 2)
+
+        search = LocalSearch(generator, time_budget=0, rng=random.Random(0), tabu_tenure=2)
+        search.run()
+        self.assertEqual(search.tabu.maxlen, 2)
+
+    def test_swap_needs_a_feasible_time_for_both_sessions(self):
+        generator = self.make_generator()
+        search = LocalSearch(generator, time_budget=0, rng=random.Random(0))
+        search._score_all()
+        slot, other = next(
+            (slot, other)
+            for slot in generator.placed_slots for other in generator.placed_slots
+            if slot.day != other.day and
+            slot.end_minute - slot.start_minute == other.end_minute - other.start_minute
+        )
+        first = generator.slot_allocations[slot]
+        before = {
+            placed: (allocation, placed.day, placed.start_minute)
+            for placed, allocation in generator.slot_allocations.items()
+        }
+        feasible = generator._feasible_sessions
+        with mock.patch.object(
+            generator, '_feasible_sessions',
+            lambda allocation: [] if allocation is first else feasible(allocation)
+        ):
+            search._try_swap(slot, [other])
+
+        self.assertEqual(
+            {
+                placed: (allocation, placed.day, placed.start_minute)
+                for placed, allocation in generator.slot_allocations.items()
+            },
+            before
+        )
+
+
+class PartitionTest(SimpleTestCase):
+    def make_instance(self, pairs):
+        """One Lecture allocation per (staff index, class index) pair, one room"""
+        program = ProgramRecord(0, 1, 'Diploma', '6', 1)
+        count = len(pairs)
+        modules = [ModuleRecord(index, index + 1, 'Lecture', 10, 1) for index in range(count)]
+        groups = [ClassRecord(index, index + 1, 40, 'A', '2025/2026', program) for index in range(count)]
+        staff = [StaffRecord(index, index + 1, 1) for index in range(count)]
+        return ProblemInstance(
+            [program], modules, [RoomRecord(0, 1, 'Lecture', 60)], staff, groups,
+            [
+                AllocationRecord(index, index + 1, groups[group], modules[index], staff[teacher], program)
+                for index, (teacher, group) in enumerate(pairs)
+            ],
+            [[] for _ in staff]
+        )
+
+    def test_shared_staff_or_class_stay_together(self):
+        # 1 and 2 share staff 0, 2 and 3 share class 1; 4 and 5 stand alone
+        instance = self.make_instance([(0, 0), (0, 1), (1, 1), (2, 2), (3, 3)])
+        partitions = partition_allocations(instance.allocations, 3)
+
+        groups = [{allocation.allocation_id for allocation in partition} for partition in partitions]
+        self.assertCountEqual(groups, [{1, 2, 3}, {4}, {5}])
+        for partition in partitions:
+            for other in partitions:
+                if other is not partition:
+                    self.assertFalse(
+                        {a.staff_id.staff_id for a in partition} & {a.staff_id.staff_id for a in other}
+                    )
+                    self.assertFalse(
+                        {a.class_id.Class_id for a in partition} & {a.class_id.Class_id for a in other}
+                    )
+
+    def test_cross_partition_room_clashes_are_repaired(self):
+        # Both partitions pick the only room at the same first time
+        generator = TimetableGenerator(instance=self.make_instance([(0, 0), (1, 1)]), optimization_budget=0)
+        generator._prepare_allocations()
+        merged_clashes = []
+        resolve = generator._resolve_conflicts
+
+        def record_then_resolve():
+            merged_clashes.extend(generator.resource_manager.clashing_rooms())
+            resolve()
+
+        with mock.patch.object(generator, '_resolve_conflicts', record_then_resolve):
+            generator._generate_partitioned(2)
+
+        self.assertEqual(merged_clashes, [1])
+        self.assertEqual(generator.resource_manager.clashing_rooms(), [])
+        week_minutes = [
+            (slot.day_index * 1440 + slot.start_minute, slot.day_index * 1440 + slot.end_minute, slot)
+            for slot in generator.resource_manager.room_schedule[1]
+        ]
+        self.assertEqual(find_overlaps(week_minutes), [])
+        placed = {allocation.allocation_id for allocation in generator.slot_allocations.values()}
+        failed = {allocation.allocation_id for _, allocation in generator.failed_allocations}
+        self.assertEqual(placed | failed, {1, 2})
+
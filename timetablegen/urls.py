@@ -16,6 +16,8 @@ router.register(r'timetables', views.TimetableViewSet, basename='timetable')
 router.register(r'teacher-preferences', views.TeacherPreferenceViewSet, basename='teacher-preference')
 router.register(r'module-allocations', views.ClassModuleAllocationViewSet, basename='module-allocation')
 router.register(r'conflicts', views.ConflictViewSet, basename='conflict')
+router.register(r'timetable-versions', views.TimetableVersionViewSet, basename='timetable-version')
+router.register(r'generation-jobs', views.GenerationJobViewSet, basename='generation-job')
 
 urlpatterns = [
     # Include the router URLs
@@ -4,18 +4,20 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from .forms import ModuleForm, DepartmentForm, RoomForm, StaffForm, ProgramForm
 from .models import Module, Program, Department, Room, TeacherPreference, Staff, Timetable, ClassModuleAllocation, Class
-from .generator import TimetableGenerator
 from django.core.validators import FileExtensionValidator
 import csv
 import io
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.core.exceptions import ValidationError
 from .serializers import *
 from .models import *
-from .generator import TimetableGenerator
+from .jobs import start_generation_job, start_repair_job
+from .repair import ChangeSet
+from .conflicts import ConflictDetector, MODEL_CONFLICT_TYPES
+from . import resultcache
 from django.db.models import Count, Q
 from datetime import datetime
 
@@ -93,13 +95,13 @@ class ModulesListView(LoginRequiredMixin, View):
 def generate_timetable_view(request):
     if request.method == "POST":
         try:
-            generator = TimetableGenerator()
-            result = generator.generate_timetable()
+            job = start_generation_job(user=request.user)
             return JsonResponse({
                 'success': True,
-                'message': 'Timetable generated successfully',
-                'data': result
-            })
+                'message': 'Timetable generation queued',
+                'job_id': job.job_id,
+                'status': job.status
+            }, status=202)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -213,11 +215,11 @@ class DepartmentsListView(LoginRequiredMixin, View):
 
 def view_timetable(request):
     try:
-        timetables = Timetable.objects.select_related(
+        timetables = Timetable.objects.active().select_related(
             'module_id',
             'room_id',
             'staff_id'
-        ).all()
+        )
         
         return JsonResponse({
             'success': True,
@@ -330,7 +332,7 @@ class RoomViewSet(viewsets.ModelViewSet):
         start_time = request.query_params.get('start_time')
         end_time = request.query_params.get('end_time')
 
-        occupied_rooms = Timetable.objects.filter(
+        occupied_rooms = Timetable.objects.active().filter(
             day_of_week=day,
             start_time__lt=end_time,
             end_time__gt=start_time
@@ -349,7 +351,7 @@ class StaffViewSet(viewsets.ModelViewSet):
     def schedule(self, request, pk=None):
         """Get staff member's teaching schedule"""
         staff = self.get_object()
-        timetable = Timetable.objects.filter(staff_id=staff)
+        timetable = Timetable.objects.active().filter(staff_id=staff)
         serializer = TimetableSerializer(timetable, many=True)
         return Response(serializer.data)
 
@@ -380,10 +382,23 @@ class ClassViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class TimetableViewSet(viewsets.ModelViewSet):
-    queryset = Timetable.objects.all()
+    queryset = Timetable.objects.active()
     serializer_class = TimetableSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer):
+        serializer.save(version=self._active_version())
+
+    def perform_update(self, serializer):
+        serializer.save(version=self._active_version())
+
+    def _active_version(self):
+        """Entries written through the API belong to the published version"""
+        version = TimetableVersion.active()
+        if version is None:
+            raise serializers.ValidationError({'version': 'No timetable version has been published yet'})
+        return version
+
     @action(detail=False, methods=['get'])
     def by_class(self, request):
         """Get timetable for a specific class"""
@@ -400,12 +415,38 @@ class TimetableViewSet(viewsets.ModelViewSet):
         serializer = self.serializer_class(timetable, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Queue a timetable generation job and return its id"""
+        try:
+            job = start_generation_job(user=request.user)
+            serializer = GenerationJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def repair(self, request):
+        """Queue a repair of only the entries affected by a change set"""
+        try:
+            semester = request.data.get('semester')
+            job = start_repair_job(
+                ChangeSet.from_dict(request.data),
+                academic_year=request.data.get('academic_year'),
+                semester=int(semester) if semester is not None else None,
+                user=request.user
+            )
+            serializer = GenerationJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
         """Bulk update timetable entries"""
         serializer = self.serializer_class(data=request.data, many=True)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(version=self._active_version())
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -447,6 +488,25 @@ class ConflictViewSet(viewsets.ModelViewSet):
         serializer = self.serializer_class(conflict)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def audit(self, request):
+        """Detect staff, room and class stream clashes in the stored timetable"""
+        entries = Timetable.objects.active().only(
+            'timetable_id', 'staff_id', 'room_id', 'class_id', 'class_stream',
+            'day_of_week', 'start_time', 'end_time'
+        )
+        conflicts = [
+            Conflict(
+                timetable_id_1=conflict.slot_1,
+                timetable_id_2=conflict.slot_2,
+                conflict_type=MODEL_CONFLICT_TYPES[conflict.conflict_type],
+                conflict_description=f"{conflict.conflict_type} {conflict.resource_id} double-booked"
+            )
+            for conflict in ConflictDetector().audit_timetable(entries)
+        ]
+        serializer = self.serializer_class(conflicts, many=True)
+        return Response(serializer.data)
+
 class ClassModuleAllocationViewSet(viewsets.ModelViewSet):
     queryset = ClassModuleAllocation.objects.all()
     serializer_class = ClassModuleAllocationSerializer
@@ -467,4 +527,51 @@ class ClassModuleAllocationViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class TimetableVersionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Generated timetable versions and which one is published"""
+    queryset = TimetableVersion.objects.all()
+    serializer_class = TimetableVersionSerializer
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['post'])
+    def publish(self, request, pk=None):
+        """Serve this version from every timetable endpoint"""
+        version = self.get_object()
+        version.publish()
+        return Response(self.serializer_class(version).data)
+
+    @action(detail=True, methods=['get'])
+    def entries(self, request, pk=None):
+        """Entries of any version, for comparing against the active one"""
+        version = self.get_object()
+        serializer = TimetableSerializer(version.entries.all(), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def prune(self, request):
+        """Delete old inactive versions, keeping the most recent ones"""
+        keep = int(request.data.get('keep', 5))
+        return Response({'deleted': TimetableVersion.prune(keep)})
+
+class GenerationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of background timetable generation jobs"""
+    queryset = GenerationJob.objects.all()
+    serializer_class = GenerationJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['get'])
+    def profile(self, request, pk=None):
+        """Per-phase timings, query counts and search counters of a run"""
+        job = self.get_object()
+        return Response({
+            'job_id': job.job_id,
+            'status': job.status,
+            'profile': job.profile
+        })
+
+    @action(detail=False, methods=['post'], url_path='clear-cache')
+    def clear_cache(self, request):
+        """Forget cached generation results so the next job solves from scratch"""
+        return Response({'cleared': resultcache.invalidate()})